@@ -1,10 +1,13 @@
 # app.py - VERSIÓN COMPLETA CON TU CARGA + DASHBOARD
+import os
 import streamlit as st
 from datetime import datetime
 import pandas as pd
 
 # Importar desde core
-from core import ProcesadorArchivos, CalculadoraResultados, formatear_monto, VisualizadorResultados
+from core import (AgregadosPeriodo, AlmacenDocumentos, CacheParseo, CalculadoraResultados,
+                  IndiceDuplicados, IngestorLotes, VistaDocumentos, PATRON_PERIODO, formatear_monto, formatear_montos,
+                  VisualizadorResultados, CacheFiguras, INSTRUMENTACION, PERFILADOR)
 
 # ==========================================
 # CONFIGURACIÓN
@@ -38,10 +41,28 @@ st.title("📊 Simulador de Resultados - Dashboard")
 # ESTADO DE LA APLICACIÓN
 # ==========================================
 
+if 'almacen' not in st.session_state:
+    st.session_state.almacen = AlmacenDocumentos()
 if 'archivos_procesados' not in st.session_state:
-    st.session_state.archivos_procesados = {}
+    # Arranque en caliente: lo asignado en sesiones anteriores se abre desde disco
+    (st.session_state.archivos_procesados,
+     st.session_state.periodos_asignados) = st.session_state.almacen.cargar()
 if 'periodos_asignados' not in st.session_state:
     st.session_state.periodos_asignados = {}
+if 'agregados' not in st.session_state:
+    st.session_state.agregados = AgregadosPeriodo.desde_archivos(
+        st.session_state.archivos_procesados, st.session_state.periodos_asignados
+    )
+if 'indice_duplicados' not in st.session_state:
+    st.session_state.indice_duplicados = IndiceDuplicados()
+if 'cache_parseo' not in st.session_state:
+    st.session_state.cache_parseo = CacheParseo()
+if 'cache_figuras' not in st.session_state:
+    st.session_state.cache_figuras = CacheFiguras()
+if 'ingesta_workers' not in st.session_state:
+    st.session_state.ingesta_workers = os.cpu_count() or 1
+if 'ingesta_pool' not in st.session_state:
+    st.session_state.ingesta_pool = "Procesos"
 
 # ==========================================
 # FUNCIONES AUXILIARES (TU VERSIÓN)
@@ -64,6 +85,41 @@ def formatear_nombre_archivo(nombre_completo):
     
     return nombre
 
+def sincronizar_duplicados():
+    """Pone al día el índice de duplicados y, si está activado, los descuenta de los agregados."""
+    indice = st.session_state.indice_duplicados
+    indice.sincronizar(st.session_state.archivos_procesados)
+    st.session_state.agregados.excluir_duplicados(
+        st.session_state.archivos_procesados,
+        indice if st.session_state.get('excluir_duplicados', False) else None
+    )
+
+def omitir_perfilado():
+    """Callback de los controles de diagnóstico (Config): el rerun que provocan no se perfila."""
+    st.session_state.omitir_perfilado = True
+
+def procesar_archivos_nuevos(archivos, tipo_archivo):
+    """Procesa en paralelo los archivos aún no asignados, mostrando el avance."""
+    nuevos = [a for a in archivos if a.name not in st.session_state.archivos_procesados]
+    barra = None
+    
+    def al_progresar(completados, total, nombre, error):
+        nonlocal barra
+        if barra is None:
+            barra = st.progress(0.0)
+        barra.progress(completados / total, text=f"{nombre} ({completados}/{total})")
+    
+    ingestor = IngestorLotes(
+        max_workers=st.session_state.ingesta_workers,
+        usar_procesos=st.session_state.ingesta_pool == "Procesos"
+    )
+    resultados = ingestor.procesar(nuevos, tipo_archivo, al_progresar, cache=st.session_state.cache_parseo)
+    
+    if barra is not None:
+        barra.empty()
+    
+    return resultados
+
 # ==========================================
 # PESTAÑA 1: CARGA (TU VERSIÓN COMPLETA)
 # ==========================================
@@ -104,16 +160,13 @@ def pestana_carga():
     # Procesar ventas
     ventas_pendientes = []
     if ventas_files:
-        for archivo in ventas_files:
-            if archivo.name in st.session_state.archivos_procesados:
+        for nombre_archivo, info, error in procesar_archivos_nuevos(ventas_files, "venta"):
+            if error is not None:
+                st.error(f"❌ Error en {nombre_archivo}: {str(error)[:50]}")
                 continue
             
-            try:
-                info = ProcesadorArchivos.procesar_archivo(archivo, "venta")
-                ventas_pendientes.append((archivo.name, info, 'venta'))
-                st.session_state[f"temp_venta_{archivo.name}"] = info
-            except Exception as e:
-                st.error(f"❌ Error en {archivo.name}: {str(e)[:50]}")
+            ventas_pendientes.append((nombre_archivo, info, 'venta'))
+            st.session_state[f"temp_venta_{nombre_archivo}"] = info
     
     # Mostrar ventas pendientes
     if ventas_pendientes:
@@ -126,13 +179,15 @@ def pestana_carga():
                 with col_nombre:
                     nombre_display = formatear_nombre_archivo(nombre_archivo)
                     st.markdown(f"**{nombre_display}**")
-                    st.caption(f"{info['documentos_count']} docs")
+                    st.caption(f"{info['documentos_count']} docs · {info['formato_fecha'] or 'fecha ?'}")
                 
                 with col_info:
                     fecha_min = info['fecha_minima'].strftime('%d/%m')
                     fecha_max = info['fecha_maxima'].strftime('%d/%m')
                     st.caption(f"{fecha_min}-{fecha_max}")
                     st.caption(formatear_monto(info['total_monto']))
+                    if info['montos_invalidos']:
+                        st.caption(f"⚠️ {info['montos_invalidos']} montos no reconocidos")
                 
                 with col_año:
                     año_pred = info['año_predominante'] or datetime.now().year
@@ -167,6 +222,8 @@ def pestana_carga():
                         
                         st.session_state.archivos_procesados[nombre_archivo] = info
                         st.session_state.periodos_asignados[nombre_archivo] = periodo
+                        st.session_state.almacen.guardar(nombre_archivo, info, periodo)
+                        st.session_state.agregados.asignar(nombre_archivo, info, periodo)
                         
                         if f"temp_venta_{nombre_archivo}" in st.session_state:
                             del st.session_state[f"temp_venta_{nombre_archivo}"]
@@ -191,16 +248,13 @@ def pestana_carga():
     # Procesar compras
     compras_pendientes = []
     if compras_files:
-        for archivo in compras_files:
-            if archivo.name in st.session_state.archivos_procesados:
+        for nombre_archivo, info, error in procesar_archivos_nuevos(compras_files, "compra"):
+            if error is not None:
+                st.error(f"❌ Error en {nombre_archivo}: {str(error)[:50]}")
                 continue
             
-            try:
-                info = ProcesadorArchivos.procesar_archivo(archivo, "compra")
-                compras_pendientes.append((archivo.name, info, 'compra'))
-                st.session_state[f"temp_compra_{archivo.name}"] = info
-            except Exception as e:
-                st.error(f"❌ Error en {archivo.name}: {str(e)[:50]}")
+            compras_pendientes.append((nombre_archivo, info, 'compra'))
+            st.session_state[f"temp_compra_{nombre_archivo}"] = info
     
     # Mostrar compras pendientes
     if compras_pendientes:
@@ -213,13 +267,15 @@ def pestana_carga():
                 with col_nombre:
                     nombre_display = formatear_nombre_archivo(nombre_archivo)
                     st.markdown(f"**{nombre_display}**")
-                    st.caption(f"{info['documentos_count']} docs")
+                    st.caption(f"{info['documentos_count']} docs · {info['formato_fecha'] or 'fecha ?'}")
                 
                 with col_info:
                     fecha_min = info['fecha_minima'].strftime('%d/%m')
                     fecha_max = info['fecha_maxima'].strftime('%d/%m')
                     st.caption(f"{fecha_min}-{fecha_max}")
                     st.caption(formatear_monto(info['total_monto']))
+                    if info['montos_invalidos']:
+                        st.caption(f"⚠️ {info['montos_invalidos']} montos no reconocidos")
                 
                 with col_año:
                     año_pred = info['año_predominante'] or datetime.now().year
@@ -254,6 +310,8 @@ def pestana_carga():
                         
                         st.session_state.archivos_procesados[nombre_archivo] = info
                         st.session_state.periodos_asignados[nombre_archivo] = periodo
+                        st.session_state.almacen.guardar(nombre_archivo, info, periodo)
+                        st.session_state.agregados.asignar(nombre_archivo, info, periodo)
                         
                         if f"temp_compra_{nombre_archivo}" in st.session_state:
                             del st.session_state[f"temp_compra_{nombre_archivo}"]
@@ -310,22 +368,47 @@ def pestana_dashboard():
             help="Selecciona el enfoque del análisis"
         )
     
+    # ===== DUPLICADOS ENTRE ARCHIVOS =====
+    # El índice solo se recalcula si cambiaron los archivos; excluir solo re-asigna los afectados
+    sincronizar_duplicados()
+    indice = st.session_state.indice_duplicados
+    duplicados = indice.totales()
+    
+    if duplicados['documentos']:
+        st.warning(f"⚠️ **{duplicados['documentos']:,} documento(s) duplicado(s)** entre archivos "
+                   f"(mismo tipo, folio y RUT) por {formatear_monto(duplicados['monto'])}")
+        
+        col1, col2 = st.columns([1, 3])
+        
+        with col1:
+            st.toggle(
+                "Excluir duplicados",
+                key="excluir_duplicados",
+                on_change=sincronizar_duplicados,
+                help="Cuenta cada documento una sola vez: se conserva el del archivo cargado primero"
+            )
+        
+        with col2:
+            with st.expander("Ver duplicados"):
+                df_duplicados = pd.DataFrame(indice.resumen())
+                df_duplicados['monto'] = formatear_montos(df_duplicados['monto'])
+                st.dataframe(
+                    df_duplicados.rename(columns={
+                        'archivo': 'Archivo', 'duplicado_de': 'Ya estaba en', 'tipo_archivo': 'Tipo',
+                        'documentos': 'Documentos', 'monto': 'Monto'
+                    }),
+                    hide_index=True,
+                    use_container_width=True
+                )
+    
+    if duplicados['archivos_sin_folio']:
+        st.caption(f"{duplicados['archivos_sin_folio']} archivo(s) sin columna de folio: "
+                   "no se revisan duplicados en ellos")
+    
     # ===== PROCESAR DATOS =====
-    todos_documentos = []
-    for nombre, info in st.session_state.archivos_procesados.items():
-        for doc in info['documentos']:
-            periodo = st.session_state.periodos_asignados.get(nombre, "Sin período")
-            doc['periodo_asignado'] = periodo
-            todos_documentos.append(doc)
-    
-    # Calcular resultados
-    resumen_periodos = CalculadoraResultados.agrupar_por_periodo(
-        todos_documentos, 
-        st.session_state.periodos_asignados
-    )
-    totales = CalculadoraResultados.calcular_totales(resumen_periodos)
+    # Agregados mantenidos al asignar archivos: el costo depende de los períodos, no de los documentos
+    resumen_periodos, totales, estadisticas = st.session_state.agregados.resumir()
     datos_tabla = CalculadoraResultados.generar_dataframe_resultados(resumen_periodos)
-    estadisticas = CalculadoraResultados.calcular_estadisticas(todos_documentos)
     
     df_resultados = pd.DataFrame(datos_tabla)
     
@@ -366,9 +449,9 @@ def pestana_dashboard():
     st.markdown("---")
     st.markdown("### 📊 **Gráficos Interactivos**")
     
-    # Crear visualizaciones
-    visualizaciones = VisualizadorResultados.crear_dashboard_completo(
-        df_resultados, totales, estadisticas
+    # Crear visualizaciones (se reutilizan si los resultados no cambiaron)
+    visualizaciones = st.session_state.cache_figuras.dashboard(
+        df_resultados, totales, estadisticas, tipo_grafico
     )
     
     # Gráfico principal
@@ -392,25 +475,65 @@ def pestana_dashboard():
         if visualizaciones.get('barras_documentos'):
             st.plotly_chart(visualizaciones['barras_documentos'], use_container_width=True)
     
+    # Gráficos opcionales: solo se construyen si se activan (un toggle en session_state, no el
+    # estado del expander, que solo se conoce en el servidor desde versiones recientes de Streamlit)
+    if st.toggle("📈 Mostrar análisis adicional", key="mostrar_analisis_adicional"):
+        with st.expander("📈 **Análisis Adicional**", expanded=True):
+            if visualizaciones.get('evolucion_mensual'):
+                st.plotly_chart(visualizaciones['evolucion_mensual'], use_container_width=True)
+            
+            if visualizaciones.get('heatmap_correlacion'):
+                st.plotly_chart(visualizaciones['heatmap_correlacion'], use_container_width=True)
+            elif 'heatmap_correlacion' not in visualizaciones:
+                st.caption("La matriz de correlación requiere al menos 3 períodos")
+    
+    # Detalle diario / por documento: series largas reducidas en el servidor
+    if st.toggle("🔎 Mostrar detalle diario", key="mostrar_detalle_diario"):
+        with st.expander("🔎 **Detalle Diario**", expanded=True):
+            excluidos = indice.mascaras() if st.session_state.get('excluir_duplicados', False) else None
+            vista = VistaDocumentos(st.session_state.archivos_procesados, st.session_state.periodos_asignados,
+                                    excluidos=excluidos)
+            col1, col2 = st.columns(2)
+            
+            with col1:
+                granularidad = st.radio("Granularidad", ["Diario", "Por documento"], horizontal=True)
+            
+            with col2:
+                periodo_detalle = st.selectbox("Período", ["Todos"] + sorted(vista.por_periodo()))
+            
+            periodo = None if periodo_detalle == "Todos" else periodo_detalle
+            if granularidad == "Diario":
+                # La serie diaria se suma archivo por archivo: no hace falta copiar los documentos
+                colecciones = [documentos for _, periodo_archivo, documentos in vista
+                               if periodo is None or periodo_archivo == periodo]
+                fig_detalle = VisualizadorResultados.crear_grafico_diario(colecciones)
+            else:
+                fig_detalle = VisualizadorResultados.crear_grafico_detalle_documentos(vista.concatenar(periodo))
+            
+            if fig_detalle:
+                st.plotly_chart(fig_detalle, use_container_width=True)
+            else:
+                st.info("No hay documentos para mostrar")
+    
     # ===== TABLA DE DATOS =====
     if mostrar_tabla:
         st.markdown("---")
         st.markdown("### 📋 **Tabla de Resultados por Período**")
         
         if not df_resultados.empty:
-            # Formatear tabla
-            df_display = df_resultados.copy()
-            
-            # Formatear montos
-            for col in ['Ventas', 'Compras', 'Resultado']:
-                if col in df_display.columns:
-                    df_display[col] = df_display[col].apply(lambda x: formatear_monto(x))
-            
-            # Formatear margen
-            if 'Margen %' in df_display.columns:
-                df_display['Margen %'] = df_display['Margen %'].apply(lambda x: f"{x:+.1f}%")
+            # Formatear montos (una columna completa a la vez)
+            df_display = df_resultados.assign(**{
+                col: formatear_montos(df_resultados[col])
+                for col in ['Ventas', 'Compras', 'Resultado']
+                if col in df_resultados.columns
+            })
             
-            st.dataframe(df_display, use_container_width=True)
+            # El margen sigue numérico: lo formatea Streamlit en el navegador
+            st.dataframe(
+                df_display,
+                use_container_width=True,
+                column_config={'Margen %': st.column_config.NumberColumn(format="%+.1f%%")}
+            )
             
             # Botón para descargar
             csv = df_resultados.to_csv(index=False).encode('utf-8')
@@ -443,7 +566,24 @@ def pestana_dashboard():
                 'Monto Total': [totales['ventas_totales'], totales['compras_totales']]
             })
             st.dataframe(dist_data, use_container_width=True, hide_index=True)
-    
+
+        st.markdown("##### 📐 Dispersión de Montos")
+        detalle = st.session_state.agregados.estadisticas_detalladas()
+        dispersion_data = pd.DataFrame([
+            {
+                'Tipo': etiqueta,
+                'Desviación': formatear_monto(detalle[tipo]['desviacion']),
+                'Mínimo': formatear_monto(detalle[tipo]['minimo']),
+                'Mediana (P50)': formatear_monto(detalle[tipo]['p50']),
+                'P90': formatear_monto(detalle[tipo]['p90']),
+                'P99': formatear_monto(detalle[tipo]['p99']),
+                'Máximo': formatear_monto(detalle[tipo]['maximo'])
+            }
+            for tipo, etiqueta in (('venta', 'Ventas'), ('compra', 'Compras'))
+        ])
+        st.dataframe(dispersion_data, use_container_width=True, hide_index=True)
+        st.caption("Percentiles aproximados (error relativo ≤ 1%)")
+
     # ===== LISTA DE ARCHIVOS =====
     with st.expander("📁 **Archivos Cargados**"):
         archivos_data = []
@@ -454,11 +594,13 @@ def pestana_dashboard():
                 'Tipo': info['tipo_archivo'].capitalize(),
                 'Período': periodo,
                 'Documentos': info['documentos_count'],
-                'Monto': formatear_monto(info['total_monto'])
+                'Formato Fecha': info['formato_fecha'],
+                'Monto': info['total_monto']
             })
         
         if archivos_data:
             df_archivos = pd.DataFrame(archivos_data)
+            df_archivos['Monto'] = formatear_montos(df_archivos['Monto'])
             st.dataframe(df_archivos, use_container_width=True)
 
 # ==========================================
@@ -481,6 +623,273 @@ def pestana_configuracion():
             total_docs = sum(info['documentos_count'] for info in st.session_state.archivos_procesados.values())
             st.metric("Documentos", total_docs)
     
+    if st.session_state.archivos_procesados:
+        st.markdown("---")
+        st.markdown("### 📁 **Archivos Asignados**")
+        
+        col_archivo, col_periodo, col_reasignar, col_quitar = st.columns([3, 1.5, 1, 1])
+        
+        with col_archivo:
+            nombre_archivo = st.selectbox(
+                "Archivo",
+                list(st.session_state.archivos_procesados),
+                format_func=formatear_nombre_archivo,
+                key="config_archivo"
+            )
+        
+        with col_periodo:
+            nuevo_periodo = st.text_input(
+                "Período (AAAA-MM)",
+                value=st.session_state.periodos_asignados.get(nombre_archivo, ""),
+                key=f"config_periodo_{nombre_archivo}"
+            )
+        
+        with col_reasignar:
+            reasignar = st.button("🔁 Reasignar", use_container_width=True)
+        
+        with col_quitar:
+            if st.button("🗑️ Quitar", use_container_width=True):
+                del st.session_state.archivos_procesados[nombre_archivo]
+                st.session_state.periodos_asignados.pop(nombre_archivo, None)
+                st.session_state.agregados.quitar(nombre_archivo)
+                st.session_state.almacen.eliminar(nombre_archivo)
+                st.rerun()
+        
+        if reasignar:
+            nuevo_periodo = nuevo_periodo.strip()
+            # Un texto libre como "2024-5" o "enero" crearía un período nuevo que se ordena al final
+            if PATRON_PERIODO.fullmatch(nuevo_periodo):
+                st.session_state.periodos_asignados[nombre_archivo] = nuevo_periodo
+                st.session_state.agregados.reasignar(nombre_archivo, nuevo_periodo)
+                st.session_state.almacen.actualizar_periodo(nombre_archivo, nuevo_periodo)
+                st.rerun()
+            else:
+                st.error(f"❌ Período inválido: '{nuevo_periodo}'. Use el formato AAAA-MM (por ejemplo 2024-05)")
+    
+    st.markdown("---")
+    st.markdown("### ⚡ **Cache de Archivos**")
+    
+    stats_cache = st.session_state.cache_parseo.estadisticas()
+    col1, col2, col3, col4 = st.columns(4)
+    
+    with col1:
+        st.metric("Aciertos", stats_cache['aciertos'])
+    
+    with col2:
+        st.metric("Fallos", stats_cache['fallos'])
+    
+    with col3:
+        st.metric("Tasa de Aciertos", f"{stats_cache['tasa_aciertos']:.0%}")
+    
+    with col4:
+        st.metric("Archivos en Cache", stats_cache['entradas'])
+    
+    st.caption(f"{stats_cache['bytes'] / 1024**2:,.1f} MB de {stats_cache['max_bytes'] / 1024**2:,.0f} MB · "
+               f"{stats_cache['desalojos']} desalojos")
+    
+    stats_figuras = st.session_state.cache_figuras.estadisticas()
+    st.caption(f"Gráficos: {stats_figuras['entradas']} dashboards en cache · "
+               f"{stats_figuras['figuras_construidas']} de {stats_figuras['figuras_registradas']} figuras construidas · "
+               f"{stats_figuras['tasa_aciertos']:.0%} aciertos · {stats_figuras['desalojos']} desalojos")
+    
+    st.markdown("---")
+    st.markdown("### 🧵 **Procesamiento en Paralelo**")
+    
+    col1, col2 = st.columns(2)
+    
+    with col1:
+        st.number_input(
+            "Archivos en paralelo",
+            min_value=1,
+            max_value=max(os.cpu_count() or 1, 1) * 2,
+            key="ingesta_workers",
+            help="Cantidad de archivos que se procesan a la vez"
+        )
+    
+    with col2:
+        st.radio(
+            "Tipo de pool",
+            ["Procesos", "Hilos"],
+            key="ingesta_pool",
+            horizontal=True,
+            help="Procesos aprovecha todos los núcleos; hilos evita copiar los archivos entre procesos"
+        )
+    
+    st.markdown("---")
+    st.markdown("### 💾 **Almacén Local**")
+    
+    stats_almacen = st.session_state.almacen.estadisticas()
+    col1, col2 = st.columns(2)
+    
+    with col1:
+        st.metric("Archivos Guardados", stats_almacen['archivos'])
+    
+    with col2:
+        st.metric("Espacio en Disco", f"{stats_almacen['bytes'] / 1024**2:,.1f} MB")
+    
+    st.caption(f"`{stats_almacen['directorio']}`")
+    
+    st.markdown("---")
+    st.markdown("### ⏱️ **Tiempos por Etapa**")
+    
+    def cambiar_instrumentacion():
+        omitir_perfilado()
+        if st.session_state.instrumentacion_activa:
+            INSTRUMENTACION.activar(memoria=st.session_state.instrumentacion_memoria)
+        else:
+            INSTRUMENTACION.desactivar()
+    
+    def reiniciar_mediciones():
+        omitir_perfilado()
+        INSTRUMENTACION.limpiar()
+    
+    col1, col2 = st.columns(2)
+    
+    with col1:
+        st.toggle(
+            "Medir tiempos",
+            value=INSTRUMENTACION.activa,
+            key="instrumentacion_activa",
+            on_change=cambiar_instrumentacion,
+            help="Registra la duración de cada etapa (parseo, fechas, montos, agregación, gráficos)"
+        )
+    
+    with col2:
+        st.toggle(
+            "Medir memoria",
+            value=INSTRUMENTACION.memoria,
+            key="instrumentacion_memoria",
+            on_change=cambiar_instrumentacion,
+            help="Usa tracemalloc: bastante más lento, solo para diagnosticar"
+        )
+    
+    resumen_etapas = INSTRUMENTACION.resumen()
+    if resumen_etapas:
+        df_etapas = pd.DataFrame([
+            {'Etapa': etapa, **{k: v for k, v in datos.items() if k != 'histograma'}}
+            for etapa, datos in resumen_etapas.items()
+        ])
+        columnas_ms = ['promedio_ms', 'p50_ms', 'p90_ms', 'p99_ms', 'max_ms']
+        st.dataframe(
+            df_etapas,
+            column_config={
+                'llamadas': st.column_config.NumberColumn("Llamadas"),
+                'total_s': st.column_config.NumberColumn("Total (s)", format="%.3f"),
+                **{c: st.column_config.NumberColumn(c.replace('_ms', ' (ms)'), format="%.1f") for c in columnas_ms},
+                'filas': st.column_config.NumberColumn("Filas", format="%d"),
+                'filas_por_segundo': st.column_config.NumberColumn("Filas/s", format="%.0f"),
+                'memoria_delta_mb': st.column_config.NumberColumn("Δ Memoria (MB)", format="%.1f")
+            },
+            hide_index=True,
+            use_container_width=True
+        )
+        
+        col1, col2 = st.columns(2)
+        
+        with col1:
+            st.download_button(
+                "📥 Exportar JSON",
+                INSTRUMENTACION.exportar_json(),
+                file_name=f"tiempos_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json",
+                mime="application/json",
+                on_click=omitir_perfilado,
+                use_container_width=True
+            )
+        
+        with col2:
+            st.button("🧹 Reiniciar mediciones", on_click=reiniciar_mediciones, use_container_width=True)
+    elif INSTRUMENTACION.activa:
+        st.info("Sin mediciones todavía: carga archivos o abre el dashboard")
+    
+    st.caption("Las mediciones son del servidor completo. Con pool de procesos no se registran "
+               "los tiempos dentro de cada proceso: usa hilos para verlos.")
+    
+    st.markdown("---")
+    st.markdown("### 🔬 **Perfilado de Ejecuciones**")
+    
+    def cambiar_perfilado():
+        omitir_perfilado()
+        if st.session_state.perfilado_activo:
+            PERFILADOR.activar(memoria=st.session_state.perfilado_memoria)
+        else:
+            PERFILADOR.desactivar()
+    
+    def borrar_perfiles():
+        omitir_perfilado()
+        PERFILADOR.limpiar()
+    
+    col1, col2 = st.columns(2)
+    
+    with col1:
+        st.toggle(
+            "Perfilar cada ejecución",
+            value=PERFILADOR.activo,
+            key="perfilado_activo",
+            on_change=cambiar_perfilado,
+            help="Perfila con cProfile las pestañas Carga y Dashboard en cada rerun, salvo los que provocan estos controles"
+        )
+    
+    with col2:
+        st.toggle(
+            "Incluir asignaciones de memoria",
+            value=PERFILADOR.memoria,
+            key="perfilado_memoria",
+            on_change=cambiar_perfilado,
+            help="Compara snapshots de tracemalloc antes y después: bastante más lento"
+        )
+    
+    # Por id y no por posición: la elección sigue apuntando al mismo perfil aunque entren otros
+    perfiles = {perfil.id: perfil for perfil in reversed(PERFILADOR.perfiles)}
+    if perfiles:
+        if st.session_state.get('perfil_seleccionado') not in perfiles:
+            # El perfil elegido ya salió del buffer: se muestra el más reciente
+            st.session_state.perfil_seleccionado = next(iter(perfiles))
+        id_perfil = st.selectbox(
+            "Perfil",
+            list(perfiles),
+            format_func=lambda i: (f"#{i} · {perfiles[i].fecha.strftime('%H:%M:%S')} · {perfiles[i].etapa} · "
+                                   f"{perfiles[i].segundos:.2f}s"),
+            key="perfil_seleccionado",
+            on_change=omitir_perfilado
+        )
+        perfil = perfiles[id_perfil]
+        
+        st.code(perfil.funciones_principales(), language=None)
+        if perfil.memoria:
+            st.caption(f"Memoria pico: {perfil.memoria_pico / 1024**2:,.1f} MB · líneas con más asignaciones:")
+            st.code('\n'.join(perfil.memoria), language=None)
+        
+        col1, col2, col3 = st.columns(3)
+        
+        with col1:
+            st.download_button(
+                "📥 Descargar .pstats",
+                perfil.a_pstats(),
+                file_name=perfil.nombre_archivo('pstats'),
+                mime="application/octet-stream",
+                on_click=omitir_perfilado,
+                use_container_width=True
+            )
+        
+        with col2:
+            st.download_button(
+                "🔥 Descargar flame graph",
+                perfil.a_plegado(),
+                file_name=perfil.nombre_archivo('folded'),
+                mime="text/plain",
+                on_click=omitir_perfilado,
+                use_container_width=True,
+                help="Pilas plegadas para flamegraph.pl o speedscope.app"
+            )
+        
+        with col3:
+            st.button("🧹 Borrar perfiles", on_click=borrar_perfiles, use_container_width=True)
+    elif PERFILADOR.activo:
+        st.info("Sin perfiles todavía: usa la pestaña Carga o Dashboard para generar uno")
+    
+    st.caption(f"Se guardan los últimos {PERFILADOR.perfiles.maxlen} perfiles "
+               "(también se activa con SIMULADOR_PERFILADO=1, o =memoria).")
+    
     st.markdown("---")
     st.markdown("### 🚨 **Acciones del Sistema**")
     
@@ -492,9 +901,15 @@ def pestana_configuracion():
             if key.startswith('temp_') or key in ['archivos_procesados', 'periodos_asignados']:
                 del st.session_state[key]
         
+        st.session_state.cache_parseo.limpiar()
+        st.session_state.cache_figuras.limpiar()
+        st.session_state.almacen.limpiar()
+        
         # Inicializar estados vacíos
         st.session_state.archivos_procesados = {}
         st.session_state.periodos_asignados = {}
+        st.session_state.agregados = AgregadosPeriodo()
+        st.session_state.indice_duplicados = IndiceDuplicados()
         
         st.success("✅ Sistema reiniciado correctamente")
         st.rerun()
@@ -506,10 +921,14 @@ def pestana_configuracion():
 # Crear tabs
 tab1, tab2, tab3 = st.tabs(["📥 Carga", "📈 Dashboard", "⚙️ Config"])
 
-with tab1:
+# Las pestañas se ejecutan todas en cada rerun; los que provoca el propio diagnóstico no se perfilan
+# (si no, cada clic en Config agregaría perfiles y desplazaría del buffer al que se quería ver)
+omitir = st.session_state.pop('omitir_perfilado', False)
+
+with tab1, PERFILADOR.perfilar('carga', omitir=omitir):
     pestana_carga()
 
-with tab2:
+with tab2, PERFILADOR.perfilar('dashboard', omitir=omitir):
     pestana_dashboard()
 
 with tab3:
@@ -0,0 +1,92 @@
+# benchmarks/bench_excel.py
+"""Compara la lectura de .xlsx: pd.read_excel completo vs. lectura por columnas.
+
+Uso:
+    python -m benchmarks.bench_excel --filas 20000 50000
+"""
+import argparse
+import io
+import random
+import time
+from datetime import date, timedelta
+import openpyxl
+import pandas as pd
+from core import procesamiento
+from core.esquema import sondear_esquema
+from core.procesamiento import ProcesadorArchivos
+from core.utils import normalizar_columnas
+
+COLUMNAS_EXTRA = [
+    'Nro', 'Tipo Compra', 'RUT Proveedor', 'Razon Social', 'Folio', 'Fecha Recepcion',
+    'Fecha Acuse', 'Monto Exento', 'Monto Neto', 'Monto IVA Recuperable', 'Monto Iva No Recuperable',
+    'Codigo IVA No Rec.', 'Monto Neto Activo Fijo', 'IVA Activo Fijo', 'IVA uso Comun'
+]
+
+def generar_xlsx(filas, semilla=0):
+    """Libro de compras sintético con las columnas habituales del SII."""
+    aleatorio = random.Random(semilla)
+    libro = openpyxl.Workbook(write_only=True)
+    hoja = libro.create_sheet()
+    hoja.append(['Fecha Docto', 'Tipo Documento', 'Monto Total'] + COLUMNAS_EXTRA)
+    inicio = date(2024, 1, 1)
+    for i in range(filas):
+        fecha = inicio + timedelta(days=aleatorio.randint(0, 30))
+        tipo = 61 if aleatorio.random() < 0.05 else 33
+        monto = aleatorio.randint(1_000, 5_000_000)
+        extra = [i, 'Del Giro', '76.123.456-7', 'Proveedor SpA', 1000 + i, fecha, fecha,
+                 0, round(monto / 1.19), round(monto * 0.19 / 1.19), 0, '', 0, 0, 0]
+        hoja.append([fecha, tipo, monto] + extra)
+    salida = io.BytesIO()
+    libro.save(salida)
+    return salida.getvalue()
+
+def _leer_actual(archivo):
+    """Camino anterior: pd.read_excel del libro completo."""
+    return [normalizar_columnas(pd.read_excel(archivo))]
+
+def _leer_por_columnas(archivo, motor):
+    """Camino actual: sondeo del encabezado y lectura de solo las columnas requeridas."""
+    esquema = sondear_esquema(archivo).validar()
+    motor_original = procesamiento.MOTOR_EXCEL_RAPIDO
+    procesamiento.MOTOR_EXCEL_RAPIDO = motor
+    try:
+        return list(ProcesadorArchivos._leer_excel(archivo, procesamiento.TAMAÑO_BLOQUE_CSV, esquema))
+    finally:
+        procesamiento.MOTOR_EXCEL_RAPIDO = motor_original
+
+def medir(contenido, lector, repeticiones=3):
+    """Mejor tiempo de lectura + conversión de los documentos."""
+    mejor = float('inf')
+    for _ in range(repeticiones):
+        archivo = io.BytesIO(contenido)
+        archivo.name = 'compras.xlsx'
+        inicio = time.perf_counter()
+        for df in lector(archivo):
+            ProcesadorArchivos._procesar_bloque(df)
+        mejor = min(mejor, time.perf_counter() - inicio)
+    return mejor
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--filas', type=int, nargs='+', default=[10_000, 50_000])
+    parser.add_argument('--repeticiones', type=int, default=3)
+    args = parser.parse_args()
+
+    lectores = {
+        'read_excel (actual)': _leer_actual,
+        'openpyxl read_only': lambda a: _leer_por_columnas(a, None),
+    }
+    if procesamiento.MOTOR_EXCEL_RAPIDO:
+        lectores['calamine'] = lambda a: _leer_por_columnas(a, procesamiento.MOTOR_EXCEL_RAPIDO)
+
+    print(f"{'filas':>8}  {'lector':<22} {'segundos':>9} {'filas/s':>10} {'vs actual':>9}")
+    for filas in args.filas:
+        contenido = generar_xlsx(filas)
+        base = None
+        for nombre, lector in lectores.items():
+            segundos = medir(contenido, lector, args.repeticiones)
+            base = base or segundos
+            print(f"{filas:>8}  {nombre:<22} {segundos:>9.3f} {filas / segundos:>10,.0f} {base / segundos:>8.1f}x")
+
+if __name__ == '__main__':
+    main()
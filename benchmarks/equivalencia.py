@@ -0,0 +1,251 @@
+# benchmarks/equivalencia.py
+"""Equivalencia del parseo vectorizado con el parseo fila a fila original.
+
+`procesar_por_filas` es la implementación previa a la vectorización
+(df.iterrows() con parsear_fecha / convertir_monto por celda), copiada tal
+cual. Para cada caso se comparan fechas, montos y tipos de cada documento y
+los totales del archivo. Los CSV se procesan además con distintos tamaños
+de bloque, que deben dar exactamente lo mismo. Falla (código 1) si algún
+caso difiere.
+
+Uso:
+    python -m benchmarks.equivalencia
+    python -m benchmarks.equivalencia --filas 100000
+"""
+import argparse
+import io
+import sys
+from collections import defaultdict
+from datetime import datetime
+import numpy as np
+import pandas as pd
+from benchmarks.generador import generar_csv, generar_xlsx
+from core import ProcesadorArchivos
+from core.procesamiento import TAMAÑO_BLOQUE_CSV
+from core.utils import AÑO_MAXIMO, AÑO_MINIMO, normalizar_columnas
+
+# ===== IMPLEMENTACIÓN ORIGINAL (FILA A FILA) =====
+
+def _parsear_fecha_original(fecha_str):
+    if pd.isna(fecha_str) or fecha_str in ['', 'nan', 'NaT', 'None']:
+        return None
+
+    fecha_str = str(fecha_str).strip()
+
+    formatos = [
+        '%Y-%m-%d', '%d/%m/%Y', '%d-%m-%Y', '%Y%m%d', '%d.%m.%Y',
+        '%Y/%m/%d', '%m/%d/%Y'
+    ]
+
+    for formato in formatos:
+        try:
+            return datetime.strptime(fecha_str, formato)
+        except:
+            continue
+
+    try:
+        numeros = ''.join(filter(str.isdigit, fecha_str))
+        if len(numeros) >= 8:
+            return datetime.strptime(numeros[:8], '%Y%m%d')
+    except:
+        pass
+
+    return None
+
+def _convertir_monto_original(monto):
+    if pd.isna(monto):
+        return 0
+
+    if isinstance(monto, (int, float)):
+        return float(monto)
+
+    monto_str = str(monto).strip()
+
+    if not monto_str or monto_str.lower() in ['nan', 'none', 'null']:
+        return 0
+
+    if '.' in monto_str and ',' in monto_str:
+        monto_str = monto_str.replace('.', '').replace(',', '.')
+    elif ',' in monto_str:
+        monto_str = monto_str.replace(',', '.')
+
+    monto_str = monto_str.replace('$', '').replace('€', '').replace('£', '').strip()
+
+    try:
+        return float(monto_str)
+    except:
+        return 0
+
+def procesar_por_filas(archivo):
+    """Documentos [(fecha, monto, tipo_doc)] como los armaba procesar_archivo antes de vectorizarlo."""
+    if archivo.name.endswith('.csv'):
+        df = pd.read_csv(archivo, sep=';', decimal=',')
+    else:
+        df = pd.read_excel(archivo)
+    df = normalizar_columnas(df)
+
+    documentos = []
+    for _, fila in df.iterrows():
+        try:
+            tipo_doc_val = fila.get('tipo_documento', 0)
+            tipo_doc = 0 if pd.isna(tipo_doc_val) else int(float(tipo_doc_val))
+        except:
+            tipo_doc = 0
+
+        factor = -1 if tipo_doc == 61 else 1
+        monto_total = _convertir_monto_original(fila.get('monto_total', 0))
+        fecha_dt = _parsear_fecha_original(fila.get('fecha_docto', ''))
+
+        if fecha_dt:
+            documentos.append((fecha_dt, monto_total * factor, tipo_doc))
+    return documentos
+
+def _año_mes_predominante_original(fechas):
+    contador = defaultdict(int)
+    for fecha in fechas:
+        contador[f"{fecha.year}-{fecha.month:02d}"] += 1
+    año_mes, cantidad = max(contador.items(), key=lambda x: x[1])
+    año, mes = año_mes.split('-')
+    return int(año), int(mes), cantidad
+
+# ===== CASOS =====
+
+def _archivo(contenido, nombre):
+    archivo = io.BytesIO(contenido)
+    archivo.name = nombre
+    return archivo
+
+def _csv(filas):
+    """CSV separado por ';' a partir de filas (fecha, tipo, monto) en texto."""
+    lineas = ['Fecha Docto;Tipo Documento;Monto Total'] + [';'.join(fila) for fila in filas]
+    return ('\n'.join(lineas) + '\n').encode('utf-8')
+
+# Formatos mezclados, símbolos de moneda, celdas vacías, textos inválidos y el respaldo por dígitos
+BORDES = [
+    ('15/01/2024', '33', '1.234,56'),
+    ('2024-01-16', '33', '$ 2.000,00'),
+    ('17-01-2024', '61', '500,5'),
+    ('20240118', '61.0', '€ 99'),
+    ('19.01.2024', '34', ''),
+    ('2024/01/20', '', '1.000.000,00'),
+    ('01/02/2024', 'x', 'abc'),
+    ('2024-01-21 10:30:00', '39', '7,25'),
+    ('', '33', '100'),
+    ('fecha mala', '33', '100'),
+    ('22/01/2024', '56', 'nan'),
+    ('23/01/2024', '33', '£ 3,5'),
+]
+
+# Solo puntos y no todos de a tres: el punto es decimal en todo el archivo, aunque el primer bloque no lo muestre
+SEPARADORES_AMBIGUOS = [('15/01/2024', '33', m) for m in ('2.000', '3.500', '1.5', '2.000')]
+
+# Tamaños de bloque con que se procesa cada CSV; se omiten los que darían más de MAX_BLOQUES bloques
+TAMAÑOS_BLOQUE = (TAMAÑO_BLOQUE_CSV, 3000, 997, 2)
+MAX_BLOQUES = 500
+
+# Una fila con año fuera de datetime64[ns] en un archivo por lo demás válido
+AÑOS_FUERA_DE_RANGO = [('0005-01-01', '33', '10'), ('3000-01-01', '33', '20'), ('05/01/0024', '33', '30')]
+
+def casos(filas):
+    """(nombre, contenido, tipo_archivo) de cada caso a comparar."""
+    yield 'ventas.csv', generar_csv(filas, 'venta', semilla=1), 'venta'
+    yield 'compras.csv', generar_csv(filas, 'compra', semilla=2, mes=2), 'compra'
+    yield 'compras.xlsx', generar_xlsx(min(filas, 5_000), 'compra', semilla=3), 'compra'
+    yield 'bordes.csv', _csv(BORDES * 50), 'venta'
+    yield 'ambiguos.csv', _csv(SEPARADORES_AMBIGUOS), 'venta'
+    for i, fila in enumerate(AÑOS_FUERA_DE_RANGO):
+        yield f'año_fuera_{i}.csv', _csv(BORDES * 10 + [fila] + BORDES * 10), 'venta'
+
+# ===== COMPARACIÓN =====
+
+def comparar(contenido, nombre, tipo_archivo, **opciones):
+    """Lista de diferencias (vacía si son equivalentes) entre ambas implementaciones."""
+    # datetime64[ns] no representa años fuera de AÑO_MINIMO..AÑO_MAXIMO: esas filas quedan sin fecha válida
+    originales = [d for d in procesar_por_filas(_archivo(contenido, nombre))
+                  if AÑO_MINIMO <= d[0].year <= AÑO_MAXIMO]
+    try:
+        info = ProcesadorArchivos.procesar_archivo(_archivo(contenido, nombre), tipo_archivo, **opciones)
+    except Exception as e:
+        return [str(e)]
+    documentos = info['documentos']
+
+    diferencias = []
+    if len(originales) != len(documentos):
+        return [f"documentos: {len(originales)} fila a fila vs {len(documentos)} vectorizado"]
+
+    fechas = np.array([f for f, _, _ in originales], dtype='datetime64[ns]')
+    montos = np.array([m for _, m, _ in originales], dtype=np.float64)
+    tipos = np.array([t for _, _, t in originales], dtype=np.int64)
+    if not np.array_equal(fechas, documentos.fechas_dt):
+        diferencias.append(f"fechas: {int((fechas != documentos.fechas_dt).sum())} distintas")
+    if not np.allclose(montos, documentos.montos, rtol=0, atol=1e-9):
+        diferencias.append(f"montos: {int((~np.isclose(montos, documentos.montos, rtol=0, atol=1e-9)).sum())} distintos")
+    if not np.array_equal(tipos, documentos.tipos_doc):
+        diferencias.append(f"tipos: {int((tipos != documentos.tipos_doc).sum())} distintos")
+
+    fechas_validas = [f for f, _, _ in originales]
+    esperado = {
+        'total_monto': sum(m for _, m, _ in originales),
+        'fecha_minima': min(fechas_validas),
+        'fecha_maxima': max(fechas_validas),
+        'predominante': _año_mes_predominante_original(fechas_validas)
+    }
+    obtenido = {
+        'total_monto': info['total_monto'],
+        'fecha_minima': info['fecha_minima'],
+        'fecha_maxima': info['fecha_maxima'],
+        'predominante': (info['año_predominante'], info['mes_predominante'], info['cantidad_predominante'])
+    }
+    if not np.isclose(esperado['total_monto'], obtenido['total_monto'], rtol=1e-12, atol=1e-6):
+        diferencias.append(f"total_monto: {esperado['total_monto']} vs {obtenido['total_monto']}")
+    for clave in ('fecha_minima', 'fecha_maxima', 'predominante'):
+        if esperado[clave] != obtenido[clave]:
+            diferencias.append(f"{clave}: {esperado[clave]} vs {obtenido[clave]}")
+    return diferencias
+
+def comparar_bloques(contenido, nombre, tipo_archivo, tamaños=TAMAÑOS_BLOQUE):
+    """Diferencias entre procesar el archivo con el primer tamaño de bloque y con los demás."""
+    filas = contenido.count(b'\n')
+    tamaños = [tamaños[0]] + [tamaño for tamaño in tamaños[1:] if filas / tamaño <= MAX_BLOQUES]
+    resultados = [
+        ProcesadorArchivos.procesar_archivo(_archivo(contenido, nombre), tipo_archivo, tamaño_bloque=tamaño)
+        for tamaño in tamaños
+    ]
+    base = resultados[0]
+    diferencias = []
+    for tamaño, info in zip(tamaños[1:], resultados[1:]):
+        for clave in ('documentos_count', 'montos_invalidos', 'formato_fecha', 'año_predominante',
+                      'mes_predominante', 'cantidad_predominante'):
+            if info[clave] != base[clave]:
+                diferencias.append(f"bloques de {tamaño}: {clave} {info[clave]} vs {base[clave]}")
+        # Las sumas por bloque cambian el orden de redondeo: los totales se comparan con tolerancia
+        totales = [info['total_monto']] + info['agregados']['montos']
+        totales_base = [base['total_monto']] + base['agregados']['montos']
+        if not np.allclose(totales, totales_base, rtol=1e-12, atol=1e-6) \
+                or info['agregados']['conteos'] != base['agregados']['conteos']:
+            diferencias.append(f"bloques de {tamaño}: totales {totales} vs {totales_base}")
+        if not np.array_equal(info['documentos'].montos, base['documentos'].montos):
+            diferencias.append(f"bloques de {tamaño}: montos distintos")
+    return diferencias
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--filas', type=int, default=20_000, help="Filas de los archivos sintéticos")
+    parser.add_argument('--tamaños-bloque', type=int, nargs='+', default=list(TAMAÑOS_BLOQUE),
+                        help="Tamaños de bloque a comparar en los CSV (el primero es la referencia)")
+    args = parser.parse_args()
+
+    fallidos = 0
+    for nombre, contenido, tipo_archivo in casos(args.filas):
+        diferencias = comparar(contenido, nombre, tipo_archivo)
+        if nombre.endswith('.csv') and not diferencias:
+            diferencias = comparar_bloques(contenido, nombre, tipo_archivo, args.tamaños_bloque)
+        fallidos += bool(diferencias)
+        print(f"{nombre:<16} {'ok' if not diferencias else 'DIFERENCIAS'}")
+        for diferencia in diferencias:
+            print(f"    {diferencia}")
+
+    return 1 if fallidos else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
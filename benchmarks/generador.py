@@ -0,0 +1,146 @@
+# benchmarks/generador.py
+"""Libros de ventas y compras sintéticos al estilo SII, en CSV o XLSX.
+
+Todo se genera con NumPy por columnas (sin bucles por fila), así que se
+pueden armar archivos de millones de filas. Con la misma semilla el
+contenido es idéntico entre corridas.
+
+Uso:
+    python -m benchmarks.generador --filas 100000 --tipo compra --salida compras.csv
+"""
+import argparse
+import io
+import numpy as np
+import openpyxl
+import pandas as pd
+from core.utils import _separar_miles
+
+# (formato, proporción): un formato dominante y algunas filas en otros formatos
+FORMATOS_MEZCLA = (('%d/%m/%Y', 0.85), ('%Y-%m-%d', 0.10), ('%d-%m-%Y', 0.05))
+MAX_FILAS_XLSX = 1_048_575
+
+COLUMNAS = {
+    'venta': ['Nro', 'Tipo Documento', 'Tipo Venta', 'Rut cliente', 'Razon Social', 'Folio',
+              'Fecha Docto', 'Fecha Recepcion', 'Monto Exento', 'Monto Neto', 'Monto IVA', 'Monto Total'],
+    'compra': ['Nro', 'Tipo Documento', 'Tipo Compra', 'RUT Proveedor', 'Razon Social', 'Folio',
+               'Fecha Docto', 'Fecha Recepcion', 'Monto Exento', 'Monto Neto', 'Monto IVA Recuperable', 'Monto Total']
+}
+# Tipos SII habituales (sin contar las notas de crédito, tipo 61)
+TIPOS_DOCUMENTO = {'venta': ([33, 34, 39, 56], [0.70, 0.10, 0.15, 0.05]),
+                   'compra': ([33, 34, 46, 56], [0.80, 0.10, 0.05, 0.05])}
+
+_DOS_DIGITOS = np.array([f'{i:02d}' for i in range(100)], dtype=object)
+
+def _formatear_fechas(años, meses, dias, formato):
+    """Fechas como texto en `formato` (solo %Y, %m, %d y separadores)."""
+    partes = {'Y': años.astype(str).astype(object), 'm': _DOS_DIGITOS[meses], 'd': _DOS_DIGITOS[dias]}
+    texto = np.full(len(años), '', dtype=object)
+    i = 0
+    while i < len(formato):
+        if formato[i] == '%':
+            texto = texto + partes[formato[i + 1]]
+            i += 2
+        else:
+            texto = texto + formato[i]
+            i += 1
+    return texto
+
+def _formatear_montos_cl(centavos, rng, proporcion_signo=0.02):
+    """Montos con punto de miles y coma decimal ("1.234,56"); algunos con "$ " delante."""
+    texto = _separar_miles(centavos // 100, separador='.') + ',' + _DOS_DIGITOS[centavos % 100]
+    return np.where(rng.random(len(centavos)) < proporcion_signo, '$ ' + texto, texto)
+
+def generar_dataframe(filas, tipo_archivo='venta', semilla=0, año=2024, mes=1,
+                      proporcion_nc=0.05, formatos_fecha=FORMATOS_MEZCLA, como_texto=True):
+    """DataFrame con el libro sintético.
+
+    Con como_texto=True fechas y montos van como texto (formatos mezclados y
+    "1.234,56"), igual que en un CSV; si no, como fechas y números, como en un Excel.
+    """
+    rng = np.random.default_rng(semilla)
+
+    # La mayoría de los documentos cae en el mes del libro; algunos en el mes anterior
+    inicio = np.datetime64(f'{año:04d}-{mes:02d}-01')
+    desfase = np.where(rng.random(filas) < 0.9, rng.integers(0, 28, filas), rng.integers(-28, 0, filas))
+    fechas = (inicio + desfase.astype('timedelta64[D]')).astype('datetime64[D]')
+    años = fechas.astype('datetime64[Y]').astype(int) + 1970
+    meses = fechas.astype('datetime64[M]').astype(int) % 12 + 1
+    dias = (fechas - fechas.astype('datetime64[M]')).astype(int) + 1
+
+    formatos, proporciones = zip(*formatos_fecha)
+    eleccion = rng.choice(len(formatos), size=filas, p=np.array(proporciones) / sum(proporciones))
+    textos_fecha = np.empty(filas, dtype=object)
+    for i, formato in enumerate(formatos):
+        mascara = eleccion == i
+        textos_fecha[mascara] = _formatear_fechas(años[mascara], meses[mascara], dias[mascara], formato)
+
+    tipos, pesos = TIPOS_DOCUMENTO[tipo_archivo]
+    tipo_doc = rng.choice(tipos, size=filas, p=pesos)
+    tipo_doc[rng.random(filas) < proporcion_nc] = 61
+
+    total = np.round(rng.lognormal(12, 1.5, filas) * 100).astype(np.int64)
+    neto = np.round(total / 1.19).astype(np.int64)
+    columnas = COLUMNAS[tipo_archivo]
+
+    # Neto e IVA van como enteros; el total, que es lo que se procesa, con formato chileno
+    montos = [neto // 100, (total - neto) // 100]
+    if como_texto:
+        montos.append(_formatear_montos_cl(total, rng))
+    else:
+        textos_fecha = fechas.astype('datetime64[ns]')
+        montos.append(total / 100)
+
+    return pd.DataFrame({
+        columnas[0]: np.arange(1, filas + 1),
+        columnas[1]: tipo_doc,
+        columnas[2]: 'Del Giro',
+        columnas[3]: '76.123.456-7',
+        columnas[4]: 'Empresa SpA',
+        columnas[5]: rng.integers(1, 10_000_000, filas),
+        columnas[6]: textos_fecha,
+        columnas[7]: textos_fecha,
+        columnas[8]: 0,
+        columnas[9]: montos[0],
+        columnas[10]: montos[1],
+        columnas[11]: montos[2]
+    })
+
+def generar_csv(filas, tipo_archivo='venta', semilla=0, **opciones):
+    """Bytes de un CSV separado por ';' como los que exporta el SII."""
+    df = generar_dataframe(filas, tipo_archivo, semilla, **opciones)
+    return df.to_csv(sep=';', index=False).encode('utf-8')
+
+def generar_xlsx(filas, tipo_archivo='venta', semilla=0, **opciones):
+    """Bytes de un .xlsx con los mismos documentos que generar_csv, con celdas de fecha y número."""
+    if filas > MAX_FILAS_XLSX:
+        raise ValueError(f"Un .xlsx admite a lo más {MAX_FILAS_XLSX:,} filas")
+
+    df = generar_dataframe(filas, tipo_archivo, semilla, como_texto=False, **opciones)
+    libro = openpyxl.Workbook(write_only=True)
+    hoja = libro.create_sheet()
+    hoja.append(list(df.columns))
+    for fila in df.itertuples(index=False):
+        hoja.append(list(fila))
+    salida = io.BytesIO()
+    libro.save(salida)
+    return salida.getvalue()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--filas', type=int, default=100_000)
+    parser.add_argument('--tipo', choices=['venta', 'compra'], default='venta')
+    parser.add_argument('--semilla', type=int, default=0)
+    parser.add_argument('--año', type=int, default=2024)
+    parser.add_argument('--mes', type=int, default=1)
+    parser.add_argument('--proporcion-nc', type=float, default=0.05)
+    parser.add_argument('--salida', required=True, help="Archivo .csv o .xlsx")
+    args = parser.parse_args()
+
+    generar = generar_xlsx if args.salida.endswith('.xlsx') else generar_csv
+    contenido = generar(args.filas, args.tipo, args.semilla, año=args.año, mes=args.mes,
+                        proporcion_nc=args.proporcion_nc)
+    with open(args.salida, 'wb') as f:
+        f.write(contenido)
+
+if __name__ == '__main__':
+    main()
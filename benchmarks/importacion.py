@@ -0,0 +1,59 @@
+# benchmarks/importacion.py
+"""Presupuesto de tiempo de importación del paquete core.
+
+Cada medición corre en un proceso nuevo: primero importa numpy y pandas
+(que se pagan igual en cualquier uso) y luego mide solo `import core`.
+Falla (código 1) si se pasa del presupuesto o si al importar core se
+cargan dependencias pesadas que deberían importarse al usarlas.
+
+Uso:
+    python -m benchmarks.importacion
+    python -m benchmarks.importacion --presupuesto-ms 100 --repeticiones 7
+"""
+import argparse
+import json
+import subprocess
+import sys
+
+PRESUPUESTO_MS = 100
+# Solo se importan al primer uso (gráficos, lectura de .xlsx)
+MODULOS_DIFERIDOS = ('plotly', 'matplotlib', 'openpyxl', 'streamlit')
+
+_MEDICION = """
+import json, sys, time
+import numpy, pandas
+inicio = time.perf_counter()
+import {modulo}
+segundos = time.perf_counter() - inicio
+print(json.dumps({{'segundos': segundos, 'modulos': sorted(m.split('.')[0] for m in sys.modules)}}))
+"""
+
+def medir_importacion(modulo='core', repeticiones=5):
+    """(mejor tiempo en ms, módulos de primer nivel cargados) de importar `modulo`."""
+    mejor = float('inf')
+    modulos = set()
+    for _ in range(repeticiones):
+        salida = subprocess.run([sys.executable, '-c', _MEDICION.format(modulo=modulo)],
+                                capture_output=True, text=True, check=True).stdout
+        resultado = json.loads(salida.strip().splitlines()[-1])
+        mejor = min(mejor, resultado['segundos'] * 1000)
+        modulos.update(resultado['modulos'])
+    return mejor, modulos
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--presupuesto-ms', type=float, default=PRESUPUESTO_MS)
+    parser.add_argument('--repeticiones', type=int, default=5)
+    args = parser.parse_args()
+
+    milisegundos, modulos = medir_importacion('core', args.repeticiones)
+    cargados = [m for m in MODULOS_DIFERIDOS if m in modulos]
+
+    print(f"import core: {milisegundos:.1f} ms (presupuesto {args.presupuesto_ms:.0f} ms)")
+    if cargados:
+        print(f"Dependencias pesadas cargadas al importar core: {', '.join(cargados)}")
+
+    return 1 if milisegundos > args.presupuesto_ms or cargados else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,68 @@
+# benchmarks/serializacion.py
+"""Documentos que vuelven serializados: mismos datos y de solo lectura.
+
+Las colecciones que devuelve el pool de procesos de IngestorLotes llegan
+por pickle, sin pasar por ColeccionDocumentos.__init__. Se comprueba un
+round-trip por pickle y una ingesta con procesos: los arreglos deben ser
+iguales a los originales y no admitir escritura. Falla (código 1) si no.
+
+Uso:
+    python -m benchmarks.serializacion
+"""
+import argparse
+import io
+import pickle
+import sys
+import numpy as np
+from benchmarks.generador import generar_csv
+from core import IngestorLotes, ProcesadorArchivos
+
+COLUMNAS = ('fechas', 'montos', 'tipos_doc', 'codigos_tipo', 'codigos_archivo', 'folios', 'claves')
+
+def _archivo(contenido, nombre):
+    archivo = io.BytesIO(contenido)
+    archivo.name = nombre
+    return archivo
+
+def diferencias(original, recibida, origen):
+    """Lista de problemas de `recibida` frente a `original` (vacía si todo está bien)."""
+    problemas = []
+    if recibida.archivos != original.archivos:
+        problemas.append(f"{origen}: archivos {recibida.archivos} vs {original.archivos}")
+    for columna in COLUMNAS:
+        arreglo = getattr(recibida, columna)
+        if not np.array_equal(arreglo, getattr(original, columna)):
+            problemas.append(f"{origen}: {columna} distinta")
+        if arreglo.flags.writeable:
+            problemas.append(f"{origen}: {columna} admite escritura")
+    return problemas
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--filas', type=int, default=5_000)
+    args = parser.parse_args()
+
+    contenidos = {f'ventas_{i}.csv': generar_csv(args.filas, 'venta', semilla=i) for i in range(2)}
+    originales = {
+        nombre: ProcesadorArchivos.procesar_archivo(_archivo(contenido, nombre), 'venta')['documentos']
+        for nombre, contenido in contenidos.items()
+    }
+
+    problemas = []
+    for nombre, documentos in originales.items():
+        problemas += diferencias(documentos, pickle.loads(pickle.dumps(documentos)), f"pickle {nombre}")
+
+    archivos = [_archivo(contenido, nombre) for nombre, contenido in contenidos.items()]
+    for nombre, info, error in IngestorLotes(max_workers=2, usar_procesos=True).procesar(archivos, 'venta'):
+        if error is not None:
+            problemas.append(f"procesos {nombre}: {error}")
+        else:
+            problemas += diferencias(originales[nombre], info['documentos'], f"procesos {nombre}")
+
+    print('ok' if not problemas else 'DIFERENCIAS')
+    for problema in problemas:
+        print(f"    {problema}")
+    return 1 if problemas else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
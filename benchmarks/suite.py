@@ -0,0 +1,184 @@
+# benchmarks/suite.py
+"""Suite de benchmarks: parseo, agregación y gráficos sobre datos sintéticos.
+
+Cada etapa se mide con el mejor de `--repeticiones` tiempos y una corrida
+aparte con tracemalloc para la memoria pico. Los resultados se guardan en
+JSON para comparar entre versiones.
+
+Uso:
+    python -m benchmarks.suite --filas 1000 100000 1000000 --salida base.json
+    python -m benchmarks.suite --filas 1000 100000 1000000 --salida nuevo.json --comparar base.json
+"""
+import argparse
+import io
+import json
+import os
+import platform
+import subprocess
+import time
+import tracemalloc
+from datetime import datetime
+import numpy as np
+import pandas as pd
+from benchmarks.generador import generar_csv, generar_dataframe, generar_xlsx
+from core import (AgregadosPeriodo, CalculadoraResultados, ColeccionDocumentos, ProcesadorArchivos,
+                  VisualizadorResultados)
+from core.utils import normalizar_montos, parsear_fechas_serie
+
+MAX_FILAS_XLSX_POR_DEFECTO = 100_000
+PERIODOS_GRAFICOS = 36
+
+def _archivo(contenido, nombre):
+    archivo = io.BytesIO(contenido)
+    archivo.name = nombre
+    return archivo
+
+def medir(funcion, repeticiones, memoria=True):
+    """(mejor tiempo en segundos, memoria pico en bytes o None) de llamar a `funcion()`."""
+    mejor = float('inf')
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        funcion()
+        mejor = min(mejor, time.perf_counter() - inicio)
+
+    pico = None
+    if memoria:
+        tracemalloc.start()
+        try:
+            funcion()
+            pico = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+    return mejor, pico
+
+def _etapas(filas, max_filas_xlsx):
+    """Genera (nombre, función) de cada etapa para un tamaño de archivo."""
+    csv_ventas = generar_csv(filas, 'venta', semilla=1)
+    csv_compras = generar_csv(filas, 'compra', semilla=2, mes=2)
+    yield 'parseo_csv', lambda: ProcesadorArchivos.procesar_archivo(_archivo(csv_ventas, 'ventas.csv'), 'venta')
+    yield 'parseo_csv_solo_agregados', lambda: ProcesadorArchivos.procesar_archivo(
+        _archivo(csv_ventas, 'ventas.csv'), 'venta', conservar_documentos=False)
+
+    if filas <= max_filas_xlsx:
+        xlsx = generar_xlsx(filas, 'compra', semilla=3)
+        yield 'parseo_xlsx', lambda: ProcesadorArchivos.procesar_archivo(_archivo(xlsx, 'compras.xlsx'), 'compra')
+
+    textos = generar_dataframe(filas, 'venta', semilla=1)
+    yield 'fechas', lambda: parsear_fechas_serie(textos['Fecha Docto'])
+    yield 'montos', lambda: normalizar_montos(textos['Monto Total'])
+
+    ventas = ProcesadorArchivos.procesar_archivo(_archivo(csv_ventas, 'ventas.csv'), 'venta')
+    compras = ProcesadorArchivos.procesar_archivo(_archivo(csv_compras, 'compras.csv'), 'compra')
+    archivos = {'ventas.csv': ventas, 'compras.csv': compras}
+    periodos = {'ventas.csv': '2024-01', 'compras.csv': '2024-02'}
+    documentos = ColeccionDocumentos.concatenar([ventas['documentos'], compras['documentos']])
+
+    yield 'agregacion', lambda: CalculadoraResultados.resumir(documentos, periodos)
+    yield 'agregados_incrementales', lambda: AgregadosPeriodo.desde_archivos(archivos, periodos).resumir()
+    yield 'grafico_diario', lambda: VisualizadorResultados.crear_grafico_diario(documentos)
+
+def _df_resultados(periodos):
+    """Tabla de resultados con `periodos` meses, para medir los gráficos del dashboard."""
+    rng = np.random.default_rng(0)
+    resumen = {
+        f'{2000 + i // 12}-{i % 12 + 1:02d}': {
+            'ventas': float(rng.uniform(1e8, 1e10)),
+            'compras': float(rng.uniform(1e8, 1e10)),
+            'documentos_ventas': int(rng.integers(100, 10_000)),
+            'documentos_compras': int(rng.integers(100, 10_000))
+        }
+        for i in range(periodos)
+    }
+    return pd.DataFrame(CalculadoraResultados.generar_dataframe_resultados(resumen)), \
+        CalculadoraResultados.calcular_totales(resumen)
+
+def _construir_dashboard(df_resultados, totales):
+    figuras = VisualizadorResultados.crear_dashboard_completo(df_resultados, totales, {})
+    return [figuras[nombre] for nombre in figuras.keys()]
+
+def _metadatos():
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+                                text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        'fecha': datetime.now().isoformat(timespec='seconds'),
+        'commit': commit,
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'pandas': pd.__version__,
+        'plataforma': platform.platform(),
+        'cpus': os.cpu_count()
+    }
+
+def ejecutar(tamaños, repeticiones=3, memoria=True, max_filas_xlsx=MAX_FILAS_XLSX_POR_DEFECTO, al_medir=None):
+    """Corre todas las etapas y devuelve el dict de resultados (serializable a JSON)."""
+    resultados = []
+
+    def registrar(etapa, filas, segundos, pico):
+        resultado = {
+            'etapa': etapa,
+            'filas': filas,
+            'segundos': segundos,
+            'filas_por_segundo': filas / segundos if segundos > 0 else None,
+            'memoria_pico_mb': pico / 1024**2 if pico is not None else None
+        }
+        resultados.append(resultado)
+        if al_medir is not None:
+            al_medir(resultado)
+
+    for filas in tamaños:
+        for etapa, funcion in _etapas(filas, max_filas_xlsx):
+            registrar(etapa, filas, *medir(funcion, repeticiones, memoria))
+
+    df_resultados, totales = _df_resultados(PERIODOS_GRAFICOS)
+    registrar('dashboard', PERIODOS_GRAFICOS,
+              *medir(lambda: _construir_dashboard(df_resultados, totales), repeticiones, memoria))
+
+    return {'metadatos': _metadatos(), 'resultados': resultados}
+
+def comparar(actual, base):
+    """Filas (etapa, filas, segundos base, segundos actual, aceleración) para las etapas en común."""
+    indice_base = {(r['etapa'], r['filas']): r for r in base['resultados']}
+    filas = []
+    for r in actual['resultados']:
+        anterior = indice_base.get((r['etapa'], r['filas']))
+        if anterior is not None:
+            filas.append((r['etapa'], r['filas'], anterior['segundos'], r['segundos'],
+                          anterior['segundos'] / r['segundos'] if r['segundos'] > 0 else float('inf')))
+    return filas
+
+def _imprimir(resultado):
+    memoria = f"{resultado['memoria_pico_mb']:>9.1f}" if resultado['memoria_pico_mb'] is not None else f"{'-':>9}"
+    print(f"{resultado['etapa']:<26} {resultado['filas']:>9,} {resultado['segundos']:>9.4f} "
+          f"{resultado['filas_por_segundo'] or 0:>13,.0f} {memoria}", flush=True)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--filas', type=int, nargs='+', default=[1_000, 100_000, 1_000_000],
+                        help="Tamaños de archivo (filas); hasta 5_000_000 en CSV")
+    parser.add_argument('--repeticiones', type=int, default=3)
+    parser.add_argument('--sin-memoria', action='store_true', help="No medir memoria pico (más rápido)")
+    parser.add_argument('--max-filas-xlsx', type=int, default=MAX_FILAS_XLSX_POR_DEFECTO,
+                        help="Sobre este tamaño no se mide el parseo de .xlsx")
+    parser.add_argument('--salida', help="Guardar resultados en este JSON")
+    parser.add_argument('--comparar', help="JSON de una corrida anterior para comparar")
+    args = parser.parse_args()
+
+    print(f"{'etapa':<26} {'filas':>9} {'segundos':>9} {'filas/s':>13} {'pico MB':>9}")
+    resultado = ejecutar(args.filas, args.repeticiones, not args.sin_memoria, args.max_filas_xlsx, _imprimir)
+
+    if args.salida:
+        with open(args.salida, 'w', encoding='utf-8') as f:
+            json.dump(resultado, f, ensure_ascii=False, indent=1)
+
+    if args.comparar:
+        with open(args.comparar, encoding='utf-8') as f:
+            base = json.load(f)
+        print(f"\n{'etapa':<26} {'filas':>9} {'base s':>9} {'actual s':>9} {'vs base':>8}")
+        for etapa, filas, antes, ahora, aceleracion in comparar(resultado, base):
+            print(f"{etapa:<26} {filas:>9,} {antes:>9.4f} {ahora:>9.4f} {aceleracion:>7.2f}x")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,181 @@
+# cli.py - Consolidación por lotes sin interfaz (para cron)
+"""Procesa directorios de ventas y compras y escribe los resultados por período.
+
+Uso:
+    python cli.py --ventas datos/ventas --compras datos/compras --salida resultados/
+    python cli.py --ventas v1/ v2/ --compras c/ --periodos periodos.json --formato csv parquet json
+
+El período de cada archivo es el año-mes predominante de sus documentos,
+salvo que `--periodos` (JSON {"archivo": "AAAA-MM"}, por nombre o ruta)
+indique otro. Con `--duplicados reportar` (o `excluir`) se buscan documentos
+repetidos entre archivos (mismo tipo, folio y RUT) y se escribe su resumen;
+`excluir` además los descuenta. `--formato parquet` requiere pyarrow (o
+fastparquet). Sale con código 2 si algún archivo no se pudo procesar.
+"""
+import argparse
+import importlib.util
+import json
+import os
+import sys
+import time
+from pathlib import Path
+import pandas as pd
+from core import AgregadosPeriodo, CalculadoraResultados, IndiceDuplicados, IngestorLotes, PATRON_PERIODO
+
+EXTENSIONES = ('.csv', '.xlsx', '.xls')
+FORMATOS = ('csv', 'parquet', 'json')
+MODOS_DUPLICADOS = ('ignorar', 'reportar', 'excluir')
+# pandas escribe parquet con cualquiera de los dos (pip install pyarrow); no es dependencia obligatoria
+MOTORES_PARQUET = ('pyarrow', 'fastparquet')
+
+def buscar_archivos(entradas, recursivo=False):
+    """Archivos de datos dentro de las rutas entregadas (directorios o archivos)."""
+    archivos = []
+    for entrada in map(Path, entradas):
+        if entrada.is_dir():
+            candidatos = entrada.rglob('*') if recursivo else entrada.iterdir()
+            archivos.extend(sorted(p for p in candidatos if p.is_file() and p.suffix.lower() in EXTENSIONES))
+        elif entrada.is_file():
+            archivos.append(entrada)
+        else:
+            raise ValueError(f"No existe: {entrada}")
+    return archivos
+
+def cargar_periodos(ruta):
+    """Mapa archivo -> período desde un JSON (rechaza períodos que no sean AAAA-MM)."""
+    if ruta is None:
+        return {}
+    with open(ruta, encoding='utf-8') as f:
+        periodos = json.load(f)
+    if not isinstance(periodos, dict):
+        raise ValueError("El archivo de períodos debe ser un objeto JSON {\"archivo\": \"AAAA-MM\"}")
+    invalidos = {archivo: periodo for archivo, periodo in periodos.items()
+                 if not isinstance(periodo, str) or not PATRON_PERIODO.fullmatch(periodo)}
+    if invalidos:
+        raise ValueError(f"Períodos inválidos (use AAAA-MM, por ejemplo 2024-05): {invalidos}")
+    return periodos
+
+def periodo_archivo(nombre, info, periodos_manuales):
+    """Período manual (por ruta o por nombre) o el año-mes predominante."""
+    for clave in (nombre, Path(nombre).name):
+        if clave in periodos_manuales:
+            return periodos_manuales[clave]
+    if info['año_predominante'] is None:
+        return "Sin_periodo"
+    return f"{info['año_predominante']}-{info['mes_predominante']:02d}"
+
+def escribir_resultados(directorio, formatos, df_resultados, totales, estadisticas, df_archivos, df_duplicados=None):
+    """Escribe tabla por período, totales, detalle de archivos y duplicados en los formatos pedidos."""
+    directorio = Path(directorio)
+    directorio.mkdir(parents=True, exist_ok=True)
+    df_totales = pd.DataFrame([{**totales, **estadisticas}])
+
+    if 'csv' in formatos:
+        df_resultados.to_csv(directorio / 'resultados.csv', index=False)
+        df_totales.to_csv(directorio / 'totales.csv', index=False)
+        df_archivos.to_csv(directorio / 'archivos.csv', index=False)
+        if df_duplicados is not None:
+            df_duplicados.to_csv(directorio / 'duplicados.csv', index=False)
+
+    if 'parquet' in formatos:
+        df_resultados.to_parquet(directorio / 'resultados.parquet', index=False)
+        df_totales.to_parquet(directorio / 'totales.parquet', index=False)
+        df_archivos.to_parquet(directorio / 'archivos.parquet', index=False)
+        if df_duplicados is not None:
+            df_duplicados.to_parquet(directorio / 'duplicados.parquet', index=False)
+
+    if 'json' in formatos:
+        with open(directorio / 'resultados.json', 'w', encoding='utf-8') as f:
+            json.dump({
+                'periodos': df_resultados.to_dict('records'),
+                'totales': totales,
+                'estadisticas': estadisticas,
+                'archivos': df_archivos.to_dict('records'),
+                'duplicados': df_duplicados.to_dict('records') if df_duplicados is not None else None
+            }, f, ensure_ascii=False, indent=1, default=str)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--ventas', nargs='*', default=[], help="Directorios o archivos de ventas")
+    parser.add_argument('--compras', nargs='*', default=[], help="Directorios o archivos de compras")
+    parser.add_argument('--periodos', help="JSON con períodos manuales {\"archivo\": \"AAAA-MM\"}")
+    parser.add_argument('--salida', default='resultados', help="Directorio de salida")
+    parser.add_argument('--formato', nargs='+', choices=FORMATOS, default=['csv'])
+    parser.add_argument('--workers', type=int, default=None, help="Archivos en paralelo (por defecto, CPUs)")
+    parser.add_argument('--hilos', action='store_true', help="Usar hilos en vez de procesos")
+    parser.add_argument('--recursivo', action='store_true', help="Buscar archivos en subdirectorios")
+    parser.add_argument('--duplicados', choices=MODOS_DUPLICADOS, default='ignorar',
+                        help="Documentos repetidos entre archivos: ignorar (más rápido), reportar o excluir")
+    parser.add_argument('-q', '--silencioso', action='store_true', help="No mostrar el avance")
+    args = parser.parse_args(argv)
+
+    if not args.ventas and not args.compras:
+        parser.error("Indica al menos --ventas o --compras")
+    # Se revisa antes de procesar: si no, todo el lote se procesa para fallar recién al escribir
+    if 'parquet' in args.formato and not any(importlib.util.find_spec(m) for m in MOTORES_PARQUET):
+        parser.error("--formato parquet necesita pyarrow o fastparquet (pip install pyarrow)")
+
+    try:
+        periodos_manuales = cargar_periodos(args.periodos)
+    except (OSError, ValueError) as e:
+        parser.error(f"--periodos {args.periodos}: {e}")
+    # Sin revisar duplicados solo se necesitan los agregados: no se guardan documentos ni viajan entre procesos
+    revisar_duplicados = args.duplicados != 'ignorar'
+    ingestor = IngestorLotes(args.workers, usar_procesos=not args.hilos, conservar_documentos=revisar_duplicados)
+
+    archivos_procesados = {}
+    periodos_asignados = {}
+    filas_archivos = []
+    errores = 0
+    inicio = time.perf_counter()
+
+    for tipo_archivo, entradas in (('venta', args.ventas), ('compra', args.compras)):
+        rutas = buscar_archivos(entradas, args.recursivo)
+
+        def al_progresar(completados, total, nombre, error):
+            if not args.silencioso:
+                estado = f"ERROR {error}" if error is not None else "ok"
+                print(f"[{tipo_archivo} {completados}/{total}] {nombre}: {estado}", file=sys.stderr)
+
+        for nombre, info, error in ingestor.procesar(rutas, tipo_archivo, al_progresar):
+            if error is not None:
+                errores += 1
+                filas_archivos.append({'archivo': nombre, 'tipo': tipo_archivo, 'periodo': None,
+                                       'documentos': 0, 'total_monto': 0.0, 'error': str(error)})
+                continue
+
+            periodo = periodo_archivo(nombre, info, periodos_manuales)
+            archivos_procesados[nombre] = info
+            periodos_asignados[nombre] = periodo
+            filas_archivos.append({'archivo': nombre, 'tipo': tipo_archivo, 'periodo': periodo,
+                                   'documentos': info['documentos_count'], 'total_monto': info['total_monto'],
+                                   'error': None})
+
+    agregados = AgregadosPeriodo.desde_archivos(archivos_procesados, periodos_asignados)
+    df_duplicados = None
+    if revisar_duplicados:
+        indice = IndiceDuplicados.desde_archivos(archivos_procesados)
+        df_duplicados = pd.DataFrame(indice.resumen(),
+                                     columns=['archivo', 'duplicado_de', 'tipo_archivo', 'documentos', 'monto'])
+        if args.duplicados == 'excluir':
+            agregados.excluir_duplicados(archivos_procesados, indice)
+        if not args.silencioso:
+            print(f"{indice.totales()['documentos']} documentos duplicados "
+                  f"({'excluidos' if args.duplicados == 'excluir' else 'incluidos'})", file=sys.stderr)
+
+    resumen, totales, estadisticas = agregados.resumir()
+    columnas = ['Período', 'Ventas', 'Compras', 'Resultado', 'Docs V', 'Docs C', 'Margen %']
+    df_resultados = pd.DataFrame(CalculadoraResultados.generar_dataframe_resultados(resumen), columns=columnas)
+
+    escribir_resultados(args.salida, args.formato, df_resultados, totales, estadisticas, pd.DataFrame(filas_archivos),
+                        df_duplicados)
+
+    if not args.silencioso:
+        print(f"{len(archivos_procesados)} archivos, {totales['documentos_totales']} documentos, "
+              f"{len(resumen)} períodos en {time.perf_counter() - inicio:.1f}s "
+              f"({errores} con error) -> {os.path.abspath(args.salida)}", file=sys.stderr)
+
+    return 2 if errores else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,12 +1,53 @@
 # core/__init__.py
+import importlib
 from .procesamiento import ProcesadorArchivos
 from .calculos import CalculadoraResultados
-from .utils import formatear_monto
-from .visualizaciones import VisualizadorResultados  # NUEVO
+from .agregados import AgregadosPeriodo
+from .documentos import ColeccionDocumentos, VistaDocumentos
+from .duplicados import IndiceDuplicados
+from .estadisticas import AcumuladorEstadisticas
+from .cache import CacheParseo
+from .ingesta import IngestorLotes
+from .instrumentacion import INSTRUMENTACION, instrumentar
+from .perfilado import PERFILADOR
+from .persistencia import AlmacenDocumentos
+from .utils import PATRON_PERIODO, formatear_monto, formatear_montos
+
+# Los gráficos (plotly) se importan recién al usarlos: el CLI y el parseo no los necesitan
+_IMPORTACIONES_DIFERIDAS = {
+    'VisualizadorResultados': '.visualizaciones',  # NUEVO
+    'FigurasDashboard': '.visualizaciones',
+    'CacheFiguras': '.visualizaciones'
+}
+
+def __getattr__(nombre):
+    if nombre in _IMPORTACIONES_DIFERIDAS:
+        valor = getattr(importlib.import_module(_IMPORTACIONES_DIFERIDAS[nombre], __name__), nombre)
+        globals()[nombre] = valor
+        return valor
+    raise AttributeError(f"module {__name__!r} has no attribute {nombre!r}")
+
+def __dir__():
+    return sorted(set(globals()) | set(_IMPORTACIONES_DIFERIDAS))
 
 __all__ = [
     'ProcesadorArchivos', 
     'CalculadoraResultados', 
+    'AgregadosPeriodo',
+    'ColeccionDocumentos',
+    'VistaDocumentos',
+    'IndiceDuplicados',
+    'AcumuladorEstadisticas',
+    'CacheParseo',
+    'IngestorLotes',
+    'INSTRUMENTACION',
+    'instrumentar',
+    'PERFILADOR',
+    'AlmacenDocumentos',
+    'PATRON_PERIODO',
     'formatear_monto',
-    'VisualizadorResultados'  # NUEVO
+    'formatear_montos',
+    'VisualizadorResultados',  # NUEVO
+    'FigurasDashboard',
+    'CacheFiguras'
 ]
@@ -0,0 +1,159 @@
+# core/agregados.py
+import numpy as np
+from .calculos import CalculadoraResultados
+from .documentos import ColeccionDocumentos
+from .estadisticas import AcumuladorEstadisticas
+from .instrumentacion import instrumentar
+
+class AgregadosPeriodo:
+    """Agregados por período mantenidos de forma incremental.
+
+    Cada archivo aporta un parcial fijo (montos y conteos por tipo de archivo
+    y nota de crédito) que se calcula una vez al asignarlo. Asignar, reasignar
+    o quitar un archivo solo suma o resta ese parcial en su período, así que
+    resumir() cuesta lo mismo sin importar cuántos documentos haya. Los
+    documentos excluidos (p. ej. duplicados) se restan del parcial del archivo.
+    """
+
+    def __init__(self):
+        # nombre_archivo -> (periodo, montos[t, nc], conteos[t, nc])
+        self.parciales = {}
+        # periodo -> [montos[t, nc], conteos[t, nc]]
+        self.por_periodo = {}
+        # nombre_archivo -> (tipo_archivo, AcumuladorEstadisticas)
+        self.estadisticas = {}
+        # nombre_archivo -> máscara de documentos excluidos del parcial
+        self.excluidos = {}
+
+    @staticmethod
+    def parcial_archivo(info):
+        """Montos y conteos del archivo como matrices 2x2 [tipo archivo, es nota de crédito]."""
+        montos = np.zeros((2, 2))
+        conteos = np.zeros((2, 2), dtype=np.int64)
+        tipo = ColeccionDocumentos.TIPOS.index(info['tipo_archivo'])
+
+        if 'agregados' in info:
+            montos[tipo] = info['agregados']['montos']
+            conteos[tipo] = info['agregados']['conteos']
+        else:
+            # Archivos guardados antes de existir 'agregados'
+            _, montos_docs, conteos_docs = CalculadoraResultados._agregar(info['documentos'], {})
+            montos, conteos = montos_docs[0], conteos_docs[0]
+
+        return montos, conteos
+
+    @staticmethod
+    def estadisticas_archivo(info):
+        """AcumuladorEstadisticas de los montos del archivo."""
+        if 'estadisticas' in info:
+            return AcumuladorEstadisticas.desde_dict(info['estadisticas'])
+        return CalculadoraResultados.estadisticas_montos(info['documentos'])[info['tipo_archivo']]
+
+    @staticmethod
+    def desde_archivos(archivos_procesados, periodos_asignados):
+        """Construye los agregados de una sesión ya cargada."""
+        agregados = AgregadosPeriodo()
+        for nombre_archivo, info in archivos_procesados.items():
+            agregados.asignar(nombre_archivo, info, periodos_asignados.get(nombre_archivo, "Sin_periodo"))
+        return agregados
+
+    def _sumar(self, periodo, montos, conteos, signo):
+        if periodo not in self.por_periodo:
+            self.por_periodo[periodo] = [np.zeros((2, 2)), np.zeros((2, 2), dtype=np.int64)]
+
+        acumulado = self.por_periodo[periodo]
+        acumulado[0] += signo * montos
+        acumulado[1] += signo * conteos
+
+        # Sin documentos el período desaparece (y no arrastra residuos de redondeo)
+        if acumulado[1].sum() == 0:
+            del self.por_periodo[periodo]
+
+    def asignar(self, nombre_archivo, info, periodo, excluir=None):
+        """Agrega (o reemplaza) un archivo en el período indicado.
+
+        Con `excluir` (máscara sobre info['documentos']) esos documentos no se cuentan.
+        """
+        self.quitar(nombre_archivo)
+        montos, conteos = AgregadosPeriodo.parcial_archivo(info)
+        estadisticas = AgregadosPeriodo.estadisticas_archivo(info)
+
+        if excluir is not None:
+            documentos = info['documentos']
+            _, montos_excluidos, conteos_excluidos = CalculadoraResultados._agregar(documentos.filtrar(excluir), {})
+            if len(montos_excluidos):
+                montos = montos - montos_excluidos[0]
+                conteos = conteos - conteos_excluidos[0]
+            # Mínimos y percentiles no se pueden restar: se recalculan sin los excluidos
+            estadisticas = CalculadoraResultados.estadisticas_montos(documentos.filtrar(~excluir))[info['tipo_archivo']]
+            self.excluidos[nombre_archivo] = excluir
+
+        self.parciales[nombre_archivo] = (periodo, montos, conteos)
+        self._sumar(periodo, montos, conteos, 1)
+        self.estadisticas[nombre_archivo] = (info['tipo_archivo'], estadisticas)
+
+    @instrumentar()
+    def excluir_duplicados(self, archivos_procesados, indice=None):
+        """Resta los duplicados del IndiceDuplicados de cada archivo (o los vuelve a sumar con indice=None).
+
+        Solo se re-asignan los archivos cuya máscara de duplicados cambió.
+        """
+        mascaras = indice.mascaras() if indice is not None else {}
+        for nombre_archivo, (periodo, _, _) in list(self.parciales.items()):
+            mascara = mascaras.get(nombre_archivo)
+            anterior = self.excluidos.get(nombre_archivo)
+            if mascara is None and anterior is None:
+                continue
+            if mascara is not None and anterior is not None and np.array_equal(mascara, anterior):
+                continue
+            self.asignar(nombre_archivo, archivos_procesados[nombre_archivo], periodo, mascara)
+
+    def reasignar(self, nombre_archivo, periodo):
+        """Mueve el parcial de un archivo a otro período."""
+        periodo_anterior, montos, conteos = self.parciales[nombre_archivo]
+        if periodo_anterior == periodo:
+            return
+        self._sumar(periodo_anterior, montos, conteos, -1)
+        self._sumar(periodo, montos, conteos, 1)
+        self.parciales[nombre_archivo] = (periodo, montos, conteos)
+
+    def quitar(self, nombre_archivo):
+        """Resta el parcial de un archivo."""
+        if nombre_archivo not in self.parciales:
+            return
+        periodo, montos, conteos = self.parciales.pop(nombre_archivo)
+        self._sumar(periodo, montos, conteos, -1)
+        del self.estadisticas[nombre_archivo]
+        self.excluidos.pop(nombre_archivo, None)
+
+    @instrumentar(filas=lambda resultado, agregados: len(resultado[0]))
+    def resumir(self):
+        """Resumen por período, totales y estadísticas (mismo formato que CalculadoraResultados.resumir)."""
+        periodos = list(self.por_periodo)
+        if periodos:
+            montos = np.stack([self.por_periodo[p][0] for p in periodos])
+            conteos = np.stack([self.por_periodo[p][1] for p in periodos])
+        else:
+            montos = np.zeros((0, 2, 2))
+            conteos = np.zeros((0, 2, 2), dtype=np.int64)
+
+        resumen = CalculadoraResultados._resumen_desde_agregados(periodos, montos, conteos)
+        return (
+            resumen,
+            CalculadoraResultados.calcular_totales(resumen),
+            CalculadoraResultados._estadisticas_desde_agregados(montos, conteos)
+        )
+
+    @instrumentar(filas=lambda resultado, agregados: len(agregados.estadisticas))
+    def estadisticas_detalladas(self):
+        """Promedio, desviación, mínimo, máximo y percentiles de montos por tipo de archivo.
+
+        Mínimo, máximo y percentiles no se pueden restar, así que se combinan
+        los acumuladores de los archivos vigentes (costo por archivo, no por documento).
+        """
+        return {
+            tipo: AcumuladorEstadisticas.combinar_todos(
+                acumulador for tipo_archivo, acumulador in self.estadisticas.values() if tipo_archivo == tipo
+            ).resumen()
+            for tipo in ('venta', 'compra')
+        }
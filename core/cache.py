@@ -0,0 +1,154 @@
+# core/cache.py
+import hashlib
+from collections import OrderedDict
+from .documentos import ColeccionDocumentos
+from .procesamiento import ProcesadorArchivos
+from .utils import leer_contenido
+
+# Huellas de archivos subidos que se recuerdan (cada una pesa unos 100 bytes)
+MAX_HUELLAS = 1024
+
+class CacheLRU:
+    """Cache en memoria con desalojo LRU acotado por tamaño total."""
+
+    def __init__(self, max_bytes, tamaño=None):
+        self.max_bytes = max_bytes
+        self.tamaño = tamaño or (lambda valor: 1)
+        self.entradas = OrderedDict()
+        self.bytes_usados = 0
+        self.aciertos = 0
+        self.fallos = 0
+        self.desalojos = 0
+
+    def __contains__(self, clave):
+        return clave in self.entradas
+
+    def __len__(self):
+        return len(self.entradas)
+
+    def obtener(self, clave, defecto=None):
+        """Devuelve el valor cacheado (y lo marca como recién usado)."""
+        if clave not in self.entradas:
+            self.fallos += 1
+            return defecto
+
+        self.aciertos += 1
+        self.entradas.move_to_end(clave)
+        return self.entradas[clave][0]
+
+    def guardar(self, clave, valor):
+        """Guarda un valor, desalojando los menos usados si se excede el límite."""
+        if clave in self.entradas:
+            self.bytes_usados -= self.entradas.pop(clave)[1]
+
+        tamaño = self.tamaño(valor)
+        self.entradas[clave] = (valor, tamaño)
+        self.bytes_usados += tamaño
+
+        # Nunca se desaloja la entrada recién guardada
+        while self.bytes_usados > self.max_bytes and len(self.entradas) > 1:
+            _, (_, tamaño_desalojado) = self.entradas.popitem(last=False)
+            self.bytes_usados -= tamaño_desalojado
+            self.desalojos += 1
+
+    def limpiar(self):
+        """Vacía la cache (las estadísticas se mantienen)."""
+        self.entradas.clear()
+        self.bytes_usados = 0
+
+    def estadisticas(self):
+        """Resumen de uso de la cache."""
+        consultas = self.aciertos + self.fallos
+        return {
+            'entradas': len(self.entradas),
+            'bytes': self.bytes_usados,
+            'max_bytes': self.max_bytes,
+            'aciertos': self.aciertos,
+            'fallos': self.fallos,
+            'desalojos': self.desalojos,
+            'tasa_aciertos': self.aciertos / consultas if consultas else 0
+        }
+
+class CacheParseo:
+    """Cache de archivos procesados, indexada por hash del contenido y tipo de archivo."""
+
+    def __init__(self, max_bytes=512 * 1024 * 1024):
+        self.cache = CacheLRU(max_bytes, tamaño=CacheParseo._tamaño_resultado)
+        # Hash ya calculado por archivo subido (Streamlit reutiliza el file_id entre reruns).
+        # Cada subida trae un file_id nuevo, así que también se acota con LRU
+        self.hashes = CacheLRU(MAX_HUELLAS)
+
+    @staticmethod
+    def _tamaño_resultado(resultado):
+        if isinstance(resultado, Exception):
+            return 0
+        return resultado['documentos'].nbytes
+
+    def huella(self, archivo):
+        """Hash del contenido del archivo."""
+        file_id = getattr(archivo, 'file_id', None)
+        if file_id is not None and file_id in self.hashes:
+            return self.hashes.obtener(file_id)
+
+        huella = hashlib.blake2b(leer_contenido(archivo), digest_size=16).hexdigest()
+        if file_id is not None:
+            self.hashes.guardar(file_id, huella)
+        return huella
+
+    def buscar(self, archivo, tipo_archivo):
+        """Resultado cacheado para el archivo (info o excepción), o None si no está."""
+        resultado = self.cache.obtener((self.huella(archivo), tipo_archivo))
+        if resultado is None or isinstance(resultado, Exception):
+            return resultado
+
+        if resultado['nombre_archivo'] != archivo.name:
+            resultado = CacheParseo._renombrar(resultado, archivo.name)
+        return resultado
+
+    def registrar(self, archivo, tipo_archivo, resultado):
+        """Guarda el resultado (info o excepción) de procesar el archivo."""
+        self.cache.guardar((self.huella(archivo), tipo_archivo), resultado)
+
+    def procesar(self, archivo, tipo_archivo):
+        """Como ProcesadorArchivos.procesar_archivo, pero sin re-procesar contenido ya visto."""
+        resultado = self.buscar(archivo, tipo_archivo)
+
+        if resultado is None:
+            try:
+                archivo.seek(0)
+                resultado = ProcesadorArchivos.procesar_archivo(archivo, tipo_archivo)
+            except Exception as e:
+                # También se cachean los errores para no re-leer archivos inválidos
+                resultado = e
+            self.registrar(archivo, tipo_archivo, resultado)
+
+        if isinstance(resultado, Exception):
+            raise resultado
+        return resultado
+
+    @staticmethod
+    def _renombrar(info, nombre_archivo):
+        """Mismo contenido subido con otro nombre: se comparten los arreglos."""
+        documentos = info['documentos']
+        info = dict(info)
+        info['nombre_archivo'] = nombre_archivo
+        info['documentos'] = ColeccionDocumentos(
+            documentos.fechas,
+            documentos.montos,
+            documentos.tipos_doc,
+            documentos.codigos_tipo,
+            documentos.codigos_archivo,
+            [nombre_archivo],
+            documentos.folios,
+            documentos.claves
+        )
+        return info
+
+    def limpiar(self):
+        """Vacía la cache de archivos procesados."""
+        self.cache.limpiar()
+        self.hashes.limpiar()
+
+    def estadisticas(self):
+        """Resumen de uso de la cache."""
+        return self.cache.estadisticas()
@@ -1,35 +1,88 @@
 # core/calculos.py
-from collections import defaultdict
+import numpy as np
+from .estadisticas import AcumuladorEstadisticas
+from .instrumentacion import instrumentar, largo_primer_argumento
 from .utils import formatear_monto
 
 class CalculadoraResultados:
     """Clase para realizar cálculos de resultados."""
     
     @staticmethod
-    def agrupar_por_periodo(documentos, periodos_asignados):
-        """Agrupa documentos por período asignado."""
-        resumen = defaultdict(lambda: {
-            'ventas': 0,
-            'compras': 0,
-            'documentos_ventas': 0,
-            'documentos_compras': 0
-        })
+    @instrumentar(filas=largo_primer_argumento)
+    def _agregar(documentos, periodos_asignados):
+        """Suma montos y cuenta documentos en una sola pasada.
         
-        for doc in documentos:
-            # Obtener período asignado para este documento
-            archivo_key = doc['archivo_origen']
+        Devuelve (periodos, montos, conteos), donde montos[p, t, nc] y
+        conteos[p, t, nc] agrupan por período p, tipo de archivo t (0 venta,
+        1 compra) y nc (1 si es nota de crédito tipo 61).
+        """
+        # Período de cada archivo (en orden de aparición)
+        indice_periodos = {}
+        periodo_por_archivo = np.empty(len(documentos.archivos), dtype=np.int64)
+        for codigo, archivo_key in enumerate(documentos.archivos):
             periodo = periodos_asignados.get(archivo_key, "Sin_periodo")
-            
-            if doc['tipo'] == 'venta':
-                resumen[periodo]['ventas'] += doc['monto']
-                resumen[periodo]['documentos_ventas'] += 1
-            else:
-                resumen[periodo]['compras'] += doc['monto']
-                resumen[periodo]['documentos_compras'] += 1
+            periodo_por_archivo[codigo] = indice_periodos.setdefault(periodo, len(indice_periodos))
+        
+        clave = periodo_por_archivo[documentos.codigos_archivo] * 4
+        clave += documentos.codigos_tipo * 2
+        clave += documentos.tipos_doc == 61
+        
+        grupos = len(indice_periodos) * 4
+        montos = np.bincount(clave, weights=documentos.montos, minlength=grupos).reshape(-1, 2, 2)
+        conteos = np.bincount(clave, minlength=grupos).reshape(-1, 2, 2)
+        return list(indice_periodos), montos, conteos
+    
+    @staticmethod
+    def _resumen_desde_agregados(periodos, montos, conteos):
+        montos_tipo = montos.sum(axis=2)
+        conteos_tipo = conteos.sum(axis=2)
+        return {
+            periodo: {
+                'ventas': float(montos_tipo[i, 0]),
+                'compras': float(montos_tipo[i, 1]),
+                'documentos_ventas': int(conteos_tipo[i, 0]),
+                'documentos_compras': int(conteos_tipo[i, 1])
+            }
+            for i, periodo in enumerate(periodos)
+        }
+    
+    @staticmethod
+    def _estadisticas_desde_agregados(montos, conteos):
+        montos_tipo = montos.sum(axis=(0, 2))
+        conteos_tipo = conteos.sum(axis=(0, 2))
+        notas_credito = conteos[:, :, 1].sum(axis=0)
         
-        return dict(resumen)
+        ventas, compras = int(conteos_tipo[0]), int(conteos_tipo[1])
+        return {
+            'notas_credito_ventas': int(notas_credito[0]),
+            'notas_credito_compras': int(notas_credito[1]),
+            'promedio_venta': float(montos_tipo[0]) / ventas if ventas else 0,
+            'promedio_compra': float(montos_tipo[1]) / compras if compras else 0,
+            'total_ventas_count': ventas,
+            'total_compras_count': compras
+        }
+    
+    @staticmethod
+    @instrumentar(filas=largo_primer_argumento)
+    def resumir(documentos, periodos_asignados):
+        """Resumen por período, totales y estadísticas con una sola agregación."""
+        periodos, montos, conteos = CalculadoraResultados._agregar(documentos, periodos_asignados)
+        resumen = CalculadoraResultados._resumen_desde_agregados(periodos, montos, conteos)
+        return (
+            resumen,
+            CalculadoraResultados.calcular_totales(resumen),
+            CalculadoraResultados._estadisticas_desde_agregados(montos, conteos)
+        )
+    
+    @staticmethod
+    @instrumentar(filas=largo_primer_argumento)
+    def agrupar_por_periodo(documentos, periodos_asignados):
+        """Agrupa documentos por período asignado."""
+        periodos, montos, conteos = CalculadoraResultados._agregar(documentos, periodos_asignados)
+        return CalculadoraResultados._resumen_desde_agregados(periodos, montos, conteos)
     
     @staticmethod
+    @instrumentar(filas=largo_primer_argumento)
     def calcular_totales(resumen_periodos):
         """Calcula totales a partir del resumen por períodos."""
         total_ventas = sum(p['ventas'] for p in resumen_periodos.values())
@@ -50,6 +103,7 @@ class CalculadoraResultados:
         }
     
     @staticmethod
+    @instrumentar(filas=largo_primer_argumento)
     def generar_dataframe_resultados(resumen_periodos):
         """Genera lista de diccionarios con resultados por período."""
         periodos_ordenados = sorted(resumen_periodos.keys())
@@ -73,24 +127,17 @@ class CalculadoraResultados:
         return datos
     
     @staticmethod
+    @instrumentar(filas=largo_primer_argumento)
     def calcular_estadisticas(documentos):
         """Calcula estadísticas adicionales."""
-        # Documentos tipo 61
-        docs_61_ventas = len([d for d in documentos if d['tipo'] == 'venta' and d['tipo_doc'] == 61])
-        docs_61_compras = len([d for d in documentos if d['tipo'] == 'compra' and d['tipo_doc'] == 61])
-        
-        # Promedios
-        ventas = [d for d in documentos if d['tipo'] == 'venta']
-        compras = [d for d in documentos if d['tipo'] == 'compra']
-        
-        promedio_venta = sum(d['monto'] for d in ventas) / len(ventas) if ventas else 0
-        promedio_compra = sum(d['monto'] for d in compras) / len(compras) if compras else 0
-        
+        _, montos, conteos = CalculadoraResultados._agregar(documentos, {})
+        return CalculadoraResultados._estadisticas_desde_agregados(montos, conteos)
+    
+    @staticmethod
+    @instrumentar(filas=largo_primer_argumento)
+    def estadisticas_montos(documentos):
+        """Acumuladores de montos por tipo de archivo ('venta' / 'compra')."""
         return {
-            'notas_credito_ventas': docs_61_ventas,
-            'notas_credito_compras': docs_61_compras,
-            'promedio_venta': promedio_venta,
-            'promedio_compra': promedio_compra,
-            'total_ventas_count': len(ventas),
-            'total_compras_count': len(compras)
+            tipo: AcumuladorEstadisticas().agregar(documentos.montos[documentos.mascara_tipo(tipo)])
+            for tipo in ('venta', 'compra')
         }
@@ -0,0 +1,182 @@
+# core/documentos.py
+import numpy as np
+import pandas as pd
+
+class ColeccionDocumentos:
+    """Documentos guardados por columnas (un arreglo NumPy por campo).
+
+    Reemplaza la lista de diccionarios por documento: las fechas se guardan
+    como int64 (nanosegundos desde 1970), los montos como float64, el tipo
+    SII como int16 y el tipo de archivo / archivo de origen como códigos
+    categóricos que apuntan a `tipos` y `archivos`. La identidad del
+    documento se guarda como folio (int64, -1 si no hay) y `claves`, un hash
+    uint64 de tipo SII + folio + RUT (0 si el archivo no trae folio).
+    """
+
+    TIPOS = ('venta', 'compra')
+
+    def __init__(self, fechas, montos, tipos_doc, codigos_tipo, codigos_archivo, archivos, folios=None, claves=None):
+        self.fechas = np.asarray(fechas, dtype=np.int64)
+        self.montos = np.asarray(montos, dtype=np.float64)
+        self.tipos_doc = np.asarray(tipos_doc, dtype=np.int16)
+        self.codigos_tipo = np.asarray(codigos_tipo, dtype=np.int8)
+        self.codigos_archivo = np.asarray(codigos_archivo, dtype=np.int32)
+        self.archivos = list(archivos)
+        # Colecciones sin identidad (archivos sin folio o guardados antes de existir estas columnas)
+        self.folios = (np.full(len(self.montos), -1, dtype=np.int64) if folios is None
+                       else np.asarray(folios, dtype=np.int64))
+        self.claves = (np.zeros(len(self.montos), dtype=np.uint64) if claves is None
+                       else np.asarray(claves, dtype=np.uint64))
+        
+        # Los documentos de la sesión son de solo lectura: nadie los modifica al renderizar
+        for columna in (self.fechas, self.montos, self.tipos_doc, self.codigos_tipo, self.codigos_archivo,
+                        self.folios, self.claves):
+            columna.flags.writeable = False
+
+    @staticmethod
+    def desde_archivo(fechas, montos, tipos_doc, tipo_archivo, nombre_archivo, folios=None, claves=None):
+        """Crea la colección de un único archivo a partir de sus columnas."""
+        fechas = np.asarray(fechas, dtype='datetime64[ns]').view(np.int64)
+        cantidad = len(fechas)
+        return ColeccionDocumentos(
+            fechas,
+            montos,
+            tipos_doc,
+            np.full(cantidad, ColeccionDocumentos.TIPOS.index(tipo_archivo), dtype=np.int8),
+            np.zeros(cantidad, dtype=np.int32),
+            [nombre_archivo],
+            folios,
+            claves
+        )
+
+    @staticmethod
+    def vacia():
+        """Colección sin documentos."""
+        return ColeccionDocumentos([], [], [], [], [], [])
+
+    @staticmethod
+    def concatenar(colecciones):
+        """Une varias colecciones re-codificando los archivos de origen."""
+        colecciones = [c for c in colecciones if len(c)]
+        if not colecciones:
+            return ColeccionDocumentos.vacia()
+
+        archivos = []
+        indice_archivos = {}
+        codigos = []
+        for coleccion in colecciones:
+            remapeo = np.empty(len(coleccion.archivos), dtype=np.int32)
+            for i, nombre in enumerate(coleccion.archivos):
+                if nombre not in indice_archivos:
+                    indice_archivos[nombre] = len(archivos)
+                    archivos.append(nombre)
+                remapeo[i] = indice_archivos[nombre]
+            codigos.append(remapeo[coleccion.codigos_archivo])
+
+        return ColeccionDocumentos(
+            np.concatenate([c.fechas for c in colecciones]),
+            np.concatenate([c.montos for c in colecciones]),
+            np.concatenate([c.tipos_doc for c in colecciones]),
+            np.concatenate([c.codigos_tipo for c in colecciones]),
+            np.concatenate(codigos),
+            archivos,
+            np.concatenate([c.folios for c in colecciones]),
+            np.concatenate([c.claves for c in colecciones])
+        )
+
+    def __reduce__(self):
+        # pickle (pool de procesos, caché) restaura sin pasar por __init__: se reconstruye con él
+        # para que los arreglos recibidos también queden de solo lectura
+        return (ColeccionDocumentos, (self.fechas, self.montos, self.tipos_doc, self.codigos_tipo,
+                                      self.codigos_archivo, self.archivos, self.folios, self.claves))
+
+    def __len__(self):
+        return len(self.montos)
+
+    @property
+    def fechas_dt(self):
+        """Fechas como datetime64[ns] (vista, sin copia)."""
+        return self.fechas.view('datetime64[ns]')
+
+    @property
+    def nbytes(self):
+        """Memoria ocupada por los arreglos."""
+        return (self.fechas.nbytes + self.montos.nbytes + self.tipos_doc.nbytes
+                + self.codigos_tipo.nbytes + self.codigos_archivo.nbytes
+                + self.folios.nbytes + self.claves.nbytes)
+
+    def filtrar(self, mascara):
+        """Nueva colección (copia) con los documentos donde `mascara` es True."""
+        return ColeccionDocumentos(
+            self.fechas[mascara],
+            self.montos[mascara],
+            self.tipos_doc[mascara],
+            self.codigos_tipo[mascara],
+            self.codigos_archivo[mascara],
+            self.archivos,
+            self.folios[mascara],
+            self.claves[mascara]
+        )
+
+    def mascara_tipo(self, tipo_archivo):
+        """Máscara booleana de los documentos de un tipo ('venta' o 'compra')."""
+        return self.codigos_tipo == ColeccionDocumentos.TIPOS.index(tipo_archivo)
+
+    def a_dataframe(self):
+        """Convierte la colección a DataFrame con las columnas originales."""
+        return pd.DataFrame({
+            'fecha': self.fechas_dt,
+            'monto': self.montos,
+            'tipo': pd.Categorical.from_codes(self.codigos_tipo, categories=list(ColeccionDocumentos.TIPOS)),
+            'tipo_doc': self.tipos_doc,
+            'folio': self.folios,
+            'archivo_origen': pd.Categorical.from_codes(self.codigos_archivo, categories=self.archivos)
+        })
+
+class VistaDocumentos:
+    """Vista de solo lectura sobre los documentos de todos los archivos de la sesión.
+
+    No copia ni concatena: guarda referencias a la ColeccionDocumentos de cada
+    archivo y resuelve el período con un índice por archivo, en vez de anotar
+    el período en cada documento. Con `excluidos` ({archivo: máscara}) se
+    omiten esos documentos (p. ej. duplicados); solo esos archivos se copian.
+    """
+
+    def __init__(self, archivos_procesados, periodos_asignados, periodo_por_defecto="Sin_periodo", excluidos=None):
+        excluidos = excluidos or {}
+        self.colecciones = {
+            nombre: (info['documentos'].filtrar(~excluidos[nombre]) if nombre in excluidos
+                     else info['documentos'])
+            for nombre, info in archivos_procesados.items()
+            if info.get('documentos') is not None
+        }
+        self.periodos = {
+            nombre: periodos_asignados.get(nombre, periodo_por_defecto)
+            for nombre in self.colecciones
+        }
+
+    def __len__(self):
+        return sum(len(c) for c in self.colecciones.values())
+
+    def __iter__(self):
+        """Genera (nombre_archivo, periodo, documentos) por archivo."""
+        for nombre, documentos in self.colecciones.items():
+            yield nombre, self.periodos[nombre], documentos
+
+    def periodo(self, nombre_archivo):
+        """Período asignado a un archivo."""
+        return self.periodos[nombre_archivo]
+
+    def por_periodo(self):
+        """Colecciones agrupadas por período (sin copiar los arreglos)."""
+        grupos = {}
+        for nombre, periodo, documentos in self:
+            grupos.setdefault(periodo, []).append(documentos)
+        return grupos
+
+    def concatenar(self, periodo=None):
+        """Materializa una sola ColeccionDocumentos (copia); opcionalmente de un período."""
+        return ColeccionDocumentos.concatenar([
+            documentos for _, periodo_archivo, documentos in self
+            if periodo is None or periodo_archivo == periodo
+        ])
@@ -0,0 +1,116 @@
+# core/duplicados.py
+import numpy as np
+import pandas as pd
+from .documentos import ColeccionDocumentos
+from .instrumentacion import instrumentar
+
+# Mezcla el tipo de archivo en la clave: una venta y una compra con el mismo folio no son duplicados
+_SEMILLA_TIPO = np.uint64(0x9E3779B97F4A7C15)
+
+class IndiceDuplicados:
+    """Índice de duplicados sobre las claves (tipo SII + folio + RUT) de todos los archivos de la sesión.
+
+    Un documento es duplicado si su clave apareció primero en otro archivo,
+    cargado antes; el primero se conserva. Las repeticiones dentro de un
+    mismo archivo no cuentan: son parte de ese archivo, no de otro.
+    Se resuelve con una tabla hash (pd.factorize) sobre todas las claves: O(n),
+    sin comparar archivos de a pares. El cálculo se repite solo cuando
+    cambian los archivos.
+    """
+
+    def __init__(self):
+        # nombre_archivo -> ColeccionDocumentos, en orden de carga
+        self.colecciones = {}
+        self._mascaras = None
+        self._resumen = None
+
+    @staticmethod
+    def desde_archivos(archivos_procesados):
+        """Construye el índice de una sesión ya cargada."""
+        indice = IndiceDuplicados()
+        indice.sincronizar(archivos_procesados)
+        return indice
+
+    def sincronizar(self, archivos_procesados):
+        """Alinea el índice con los archivos de la sesión (agregados, quitados o reemplazados)."""
+        colecciones = {
+            nombre: info['documentos']
+            for nombre, info in archivos_procesados.items()
+            if info.get('documentos') is not None
+        }
+        if list(colecciones) != list(self.colecciones) or any(
+            colecciones[nombre] is not self.colecciones[nombre] for nombre in colecciones
+        ):
+            self.colecciones = colecciones
+            self._mascaras = None
+            self._resumen = None
+
+    @instrumentar()
+    def _calcular(self):
+        nombres = list(self.colecciones)
+        colecciones = list(self.colecciones.values())
+        self._mascaras = {}
+        self._resumen = []
+        if not colecciones:
+            return
+
+        claves = np.concatenate([c.claves for c in colecciones])
+        codigos_tipo = np.concatenate([c.codigos_tipo for c in colecciones]).astype(np.uint64)
+        montos = np.concatenate([c.montos for c in colecciones])
+        archivo = np.repeat(np.arange(len(colecciones)), [len(c) for c in colecciones])
+
+        posiciones = np.flatnonzero(claves != 0)
+        codigos, _ = pd.factorize(claves[posiciones] ^ (codigos_tipo[posiciones] * _SEMILLA_TIPO))
+
+        # factorize numera las claves en orden de primera aparición: cada código nuevo supera al máximo anterior
+        primera = np.flatnonzero(np.diff(np.maximum.accumulate(codigos), prepend=-1))
+        origen = posiciones[primera[codigos]]
+        es_duplicado = archivo[origen] != archivo[posiciones]
+        duplicados, origen = posiciones[es_duplicado], origen[es_duplicado]
+
+        # Resumen por (archivo, archivo donde apareció primero)
+        pares = archivo[duplicados] * len(colecciones) + archivo[origen]
+        pares_unicos, inversos, conteos = np.unique(pares, return_inverse=True, return_counts=True)
+        sumas = np.bincount(inversos, weights=montos[duplicados], minlength=len(pares_unicos))
+        for par, cantidad, monto in zip(pares_unicos, conteos, sumas):
+            self._resumen.append({
+                'archivo': nombres[par // len(colecciones)],
+                'duplicado_de': nombres[par % len(colecciones)],
+                'tipo_archivo': ColeccionDocumentos.TIPOS[colecciones[par // len(colecciones)].codigos_tipo[0]],
+                'documentos': int(cantidad),
+                'monto': float(monto)
+            })
+
+        mascara_global = np.zeros(len(claves), dtype=bool)
+        mascara_global[duplicados] = True
+        inicio = 0
+        for nombre, coleccion in zip(nombres, colecciones):
+            mascara = mascara_global[inicio:inicio + len(coleccion)]
+            if mascara.any():
+                self._mascaras[nombre] = mascara
+            inicio += len(coleccion)
+
+    def mascaras(self):
+        """{archivo: máscara de sus documentos duplicados}, solo archivos con duplicados."""
+        if self._mascaras is None:
+            self._calcular()
+        return self._mascaras
+
+    def mascara(self, nombre_archivo):
+        """Máscara de documentos duplicados de un archivo (None si no tiene)."""
+        return self.mascaras().get(nombre_archivo)
+
+    def resumen(self):
+        """Lista de {archivo, duplicado_de, tipo_archivo, documentos, monto}."""
+        if self._resumen is None:
+            self._calcular()
+        return self._resumen
+
+    def totales(self):
+        """Documentos y monto duplicados en toda la sesión."""
+        resumen = self.resumen()
+        return {
+            'documentos': sum(r['documentos'] for r in resumen),
+            'monto': sum(r['monto'] for r in resumen),
+            'archivos_sin_folio': sum(1 for c in self.colecciones.values() if len(c) and not c.claves.any())
+        }
@@ -0,0 +1,175 @@
+# core/esquema.py
+import zipfile
+import xml.etree.ElementTree as ET
+import pandas as pd
+from .instrumentacion import instrumentar
+from .utils import normalizar_nombre_columna
+
+COLUMNAS_REQUERIDAS = ['fecha_docto', 'tipo_documento', 'monto_total']
+
+# Nombres aceptados para cada columna requerida (ya normalizados), en orden de preferencia
+ALIAS_COLUMNAS = {
+    'fecha_docto': ['fecha_docto', 'fecha_documento', 'fecha_doc', 'fecha_emision', 'fecha'],
+    'tipo_documento': ['tipo_documento', 'tipo_doc', 'tipo_docto', 'tipo_dte', 'tipo'],
+    'monto_total': ['monto_total', 'total', 'monto']
+}
+
+# Identidad del documento: opcionales, se usan para detectar duplicados entre archivos
+ALIAS_COLUMNAS_IDENTIDAD = {
+    'folio': ['folio', 'nro_folio', 'numero_folio', 'folio_docto', 'folio_documento'],
+    'rut': ['rut_cliente', 'rut_proveedor', 'rut_emisor', 'rut_receptor', 'rut_contraparte', 'rut']
+}
+
+# Filas de datos que se leen al sondear (además del encabezado)
+FILAS_SONDEO = 20
+
+_NS_XLSX = '{http://schemas.openxmlformats.org/spreadsheetml/2006/main}'
+_NS_RELACIONES = '{http://schemas.openxmlformats.org/officeDocument/2006/relationships}'
+
+class EsquemaArchivo:
+    """Columnas requeridas de un archivo, resueltas solo a partir de su encabezado.
+
+    `posiciones` indica en qué columna del archivo está cada columna
+    requerida (y folio / RUT si vienen); con eso los lectores leen
+    únicamente esas columnas (usecols) y ya con su nombre normalizado.
+    """
+
+    def __init__(self, encabezado, filas_datos):
+        self.encabezado = [normalizar_nombre_columna(c) for c in encabezado]
+        self.filas_datos = filas_datos
+        self.posiciones = {}
+        for columna, alias in {**ALIAS_COLUMNAS, **ALIAS_COLUMNAS_IDENTIDAD}.items():
+            for nombre in alias:
+                if nombre in self.encabezado:
+                    self.posiciones[columna] = self.encabezado.index(nombre)
+                    break
+        self.faltantes = [c for c in COLUMNAS_REQUERIDAS if c not in self.posiciones]
+
+    def validar(self):
+        """Rechaza el archivo sin leerlo entero si faltan columnas o no trae datos."""
+        if self.faltantes:
+            raise ValueError(f"Faltan columnas: {self.faltantes} (columnas del archivo: {self.encabezado})")
+        if self.filas_datos == 0:
+            raise ValueError("El archivo no tiene filas de datos")
+        return self
+
+    @property
+    def usecols(self):
+        """Posiciones a leer, en el orden en que están en el archivo."""
+        return sorted(self.posiciones.values())
+
+    @property
+    def columnas(self):
+        """Nombres normalizados de `usecols`, en el mismo orden."""
+        por_posicion = {posicion: columna for columna, posicion in self.posiciones.items()}
+        return [por_posicion[posicion] for posicion in self.usecols]
+
+    @property
+    def dtype(self):
+        """Tipos explícitos para el lector de CSV: fecha, folio y RUT siempre como texto."""
+        return {self.posiciones[c]: str for c in ('fecha_docto', 'folio', 'rut') if c in self.posiciones}
+
+def _columna_xlsx(referencia):
+    """Índice (desde 0) de la columna de una referencia de celda como 'AB12'."""
+    indice = 0
+    for caracter in referencia:
+        if not caracter.isalpha():
+            break
+        indice = indice * 26 + ord(caracter.upper()) - 64
+    return indice - 1
+
+def _ruta_primera_hoja(libro):
+    """Ruta dentro del .xlsx de la primera hoja del libro."""
+    try:
+        hoja = ET.fromstring(libro.read('xl/workbook.xml')).find(f'{_NS_XLSX}sheets/{_NS_XLSX}sheet')
+        id_relacion = hoja.get(f'{_NS_RELACIONES}id')
+        for relacion in ET.fromstring(libro.read('xl/_rels/workbook.xml.rels')):
+            if relacion.get('Id') == id_relacion:
+                destino = relacion.get('Target')
+                return destino.lstrip('/') if destino.startswith('/') else f'xl/{destino}'
+    except (KeyError, AttributeError, ET.ParseError):
+        pass
+    return 'xl/worksheets/sheet1.xml'
+
+def _textos_compartidos(libro, indices):
+    """Textos compartidos (sharedStrings.xml) pedidos, sin leer más allá del mayor índice."""
+    if not indices or 'xl/sharedStrings.xml' not in libro.namelist():
+        return {}
+    textos = {}
+    ultimo = max(indices)
+    with libro.open('xl/sharedStrings.xml') as xml:
+        posicion = 0
+        for _, elemento in ET.iterparse(xml):
+            if elemento.tag != f'{_NS_XLSX}si':
+                continue
+            if posicion in indices:
+                textos[posicion] = ''.join(t.text or '' for t in elemento.iter(f'{_NS_XLSX}t'))
+            elemento.clear()
+            if posicion >= ultimo:
+                break
+            posicion += 1
+    return textos
+
+def _filas_iniciales_xlsx(archivo, cantidad):
+    """Primeras `cantidad` filas de la primera hoja de un .xlsx, leyendo el XML en streaming.
+
+    openpyxl recorre la hoja entera al abrirla si no trae la dimensión
+    declarada y calamine siempre la carga completa; aquí se lee hasta la fila pedida.
+    """
+    with zipfile.ZipFile(archivo) as libro:
+        filas = []
+        with libro.open(_ruta_primera_hoja(libro)) as xml:
+            for _, elemento in ET.iterparse(xml):
+                if elemento.tag != f'{_NS_XLSX}row':
+                    continue
+                fila = {}
+                for celda in elemento.iter(f'{_NS_XLSX}c'):
+                    referencia = celda.get('r')
+                    columna = _columna_xlsx(referencia) if referencia else len(fila)
+                    tipo = celda.get('t')
+                    if tipo == 'inlineStr':
+                        fila[columna] = ('', ''.join(t.text or '' for t in celda.iter(f'{_NS_XLSX}t')))
+                    else:
+                        valor = celda.find(f'{_NS_XLSX}v')
+                        fila[columna] = (tipo, valor.text if valor is not None else None)
+                filas.append(fila)
+                elemento.clear()
+                if len(filas) >= cantidad:
+                    break
+
+        indices = {int(v) for fila in filas for t, v in fila.values() if t == 's' and v is not None}
+        textos = _textos_compartidos(libro, indices)
+
+    ancho = max((max(fila) + 1 for fila in filas if fila), default=0)
+    return [
+        [textos.get(int(v)) if t == 's' and v is not None else v
+         for t, v in (fila.get(i, (None, None)) for i in range(ancho))]
+        for fila in filas
+    ]
+
+@instrumentar()
+def sondear_esquema(archivo):
+    """Lee solo el encabezado y las primeras FILAS_SONDEO filas y resuelve las columnas.
+
+    Deja la posición de lectura de `archivo` al inicio.
+    """
+    try:
+        if archivo.name.endswith('.csv'):
+            muestra = pd.read_csv(archivo, sep=';', header=None, nrows=FILAS_SONDEO + 1, dtype=str,
+                                  keep_default_na=False)
+            filas = muestra.values.tolist()
+        elif archivo.name.endswith(('.xlsx', '.xlsm')):
+            filas = _filas_iniciales_xlsx(archivo, FILAS_SONDEO + 1)
+        else:
+            muestra = pd.read_excel(archivo, header=None, nrows=FILAS_SONDEO + 1, dtype=object)
+            filas = muestra.values.tolist()
+    except pd.errors.EmptyDataError:
+        filas = []
+    except (ValueError, KeyError, zipfile.BadZipFile, ET.ParseError, pd.errors.ParserError) as e:
+        raise ValueError(f"No se pudo leer el encabezado: {e}")
+    finally:
+        archivo.seek(0)
+
+    encabezado = filas[0] if filas else []
+    filas_datos = sum(1 for fila in filas[1:] if any(v not in (None, '') and v == v for v in fila))
+    return EsquemaArchivo(encabezado, filas_datos)
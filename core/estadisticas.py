@@ -0,0 +1,163 @@
+# core/estadisticas.py
+import math
+import numpy as np
+
+class AcumuladorEstadisticas:
+    """Estadísticas de montos calculadas en una pasada y combinables.
+
+    Lleva cantidad, suma, media y M2 (varianza por el método de Chan), mínimo,
+    máximo y un sketch logarítmico de percentiles (estilo DDSketch): cada monto
+    cae en un bucket de ancho relativo fijo, así que los percentiles tienen
+    un error relativo acotado por `precision` y dos acumuladores se combinan
+    sumando sus buckets. Sirve por bloque, por archivo o por sesión.
+    """
+
+    def __init__(self, precision=0.01):
+        self.precision = precision
+        self.gamma = (1 + precision) / (1 - precision)
+        self.log_gamma = math.log(self.gamma)
+        self.cantidad = 0
+        self.suma = 0.0
+        self.media = 0.0
+        self.m2 = 0.0
+        self.minimo = math.inf
+        self.maximo = -math.inf
+        self.ceros = 0
+        # índice de bucket -> cantidad, por signo
+        self.positivos = {}
+        self.negativos = {}
+
+    def _buckets(self, valores_absolutos):
+        indices = np.ceil(np.log(valores_absolutos) / self.log_gamma).astype(np.int64)
+        return zip(*np.unique(indices, return_counts=True))
+
+    def agregar(self, valores):
+        """Incorpora un arreglo de montos."""
+        valores = np.asarray(valores, dtype=np.float64)
+        valores = valores[np.isfinite(valores)]
+        if len(valores) == 0:
+            return self
+
+        otro = AcumuladorEstadisticas(self.precision)
+        otro.cantidad = len(valores)
+        otro.suma = float(valores.sum())
+        otro.media = otro.suma / otro.cantidad
+        otro.m2 = float(((valores - otro.media) ** 2).sum())
+        otro.minimo = float(valores.min())
+        otro.maximo = float(valores.max())
+        otro.ceros = int((valores == 0).sum())
+        otro.positivos = {int(i): int(c) for i, c in self._buckets(valores[valores > 0])}
+        otro.negativos = {int(i): int(c) for i, c in self._buckets(-valores[valores < 0])}
+        return self.combinar(otro)
+
+    def combinar(self, otro):
+        """Suma otro acumulador a este (mismo resultado que procesar ambos juntos)."""
+        if otro.cantidad == 0:
+            return self
+        if otro.precision != self.precision:
+            raise ValueError("Solo se pueden combinar acumuladores con la misma precisión")
+
+        cantidad = self.cantidad + otro.cantidad
+        delta = otro.media - self.media
+        self.media += delta * otro.cantidad / cantidad
+        self.m2 += otro.m2 + delta ** 2 * self.cantidad * otro.cantidad / cantidad
+        self.cantidad = cantidad
+        self.suma += otro.suma
+        self.minimo = min(self.minimo, otro.minimo)
+        self.maximo = max(self.maximo, otro.maximo)
+        self.ceros += otro.ceros
+        for propios, ajenos in ((self.positivos, otro.positivos), (self.negativos, otro.negativos)):
+            for indice, conteo in ajenos.items():
+                propios[indice] = propios.get(indice, 0) + conteo
+        return self
+
+    @staticmethod
+    def combinar_todos(acumuladores, precision=0.01):
+        """Combina varios acumuladores en uno nuevo."""
+        total = AcumuladorEstadisticas(precision)
+        for acumulador in acumuladores:
+            total.combinar(acumulador)
+        return total
+
+    @property
+    def varianza(self):
+        return self.m2 / (self.cantidad - 1) if self.cantidad > 1 else 0.0
+
+    @property
+    def desviacion(self):
+        return math.sqrt(self.varianza)
+
+    def percentil(self, q):
+        """Percentil q (0-100) aproximado con error relativo <= precision."""
+        if self.cantidad == 0:
+            return 0.0
+
+        # El valor del bucket puede quedar apenas fuera del rango observado
+        return min(max(self._percentil_sketch(q), self.minimo), self.maximo)
+
+    def _percentil_sketch(self, q):
+        rango = q / 100 * (self.cantidad - 1)
+        acumulado = 0
+        # Orden ascendente: negativos de mayor a menor magnitud, ceros, positivos
+        for indice in sorted(self.negativos, reverse=True):
+            acumulado += self.negativos[indice]
+            if acumulado > rango:
+                return -self._valor_bucket(indice)
+        acumulado += self.ceros
+        if acumulado > rango:
+            return 0.0
+        for indice in sorted(self.positivos):
+            acumulado += self.positivos[indice]
+            if acumulado > rango:
+                return self._valor_bucket(indice)
+        return self.maximo
+
+    def _valor_bucket(self, indice):
+        return 2 * self.gamma ** indice / (self.gamma + 1)
+
+    def resumen(self):
+        """Estadísticas listas para mostrar."""
+        if self.cantidad == 0:
+            return {'cantidad': 0, 'promedio': 0, 'desviacion': 0, 'minimo': 0, 'maximo': 0,
+                    'p50': 0, 'p90': 0, 'p99': 0}
+        return {
+            'cantidad': self.cantidad,
+            'promedio': self.media,
+            'desviacion': self.desviacion,
+            'minimo': self.minimo,
+            'maximo': self.maximo,
+            'p50': self.percentil(50),
+            'p90': self.percentil(90),
+            'p99': self.percentil(99)
+        }
+
+    def a_dict(self):
+        """Representación serializable a JSON."""
+        return {
+            'precision': self.precision,
+            'cantidad': self.cantidad,
+            'suma': self.suma,
+            'media': self.media,
+            'm2': self.m2,
+            'minimo': self.minimo if self.cantidad else None,
+            'maximo': self.maximo if self.cantidad else None,
+            'ceros': self.ceros,
+            'positivos': {str(k): v for k, v in self.positivos.items()},
+            'negativos': {str(k): v for k, v in self.negativos.items()}
+        }
+
+    @staticmethod
+    def desde_dict(datos):
+        """Reconstruye un acumulador guardado con a_dict."""
+        acumulador = AcumuladorEstadisticas(datos['precision'])
+        acumulador.cantidad = datos['cantidad']
+        acumulador.suma = datos['suma']
+        acumulador.media = datos['media']
+        acumulador.m2 = datos['m2']
+        if acumulador.cantidad:
+            acumulador.minimo = datos['minimo']
+            acumulador.maximo = datos['maximo']
+        acumulador.ceros = datos['ceros']
+        acumulador.positivos = {int(k): v for k, v in datos['positivos'].items()}
+        acumulador.negativos = {int(k): v for k, v in datos['negativos'].items()}
+        return acumulador
@@ -0,0 +1,121 @@
+# core/ingesta.py
+import io
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from .procesamiento import ProcesadorArchivos
+from .utils import leer_contenido
+
+# Hacer fork de un proceso con hilos (el servidor de Streamlit) puede dejar al hijo bloqueado en un
+# candado que tenía otro hilo; forkserver arranca los procesos desde un servidor sin hilos
+_CONTEXTO_PROCESOS = multiprocessing.get_context(
+    'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+)
+if _CONTEXTO_PROCESOS.get_start_method() == 'forkserver':
+    # El servidor importa core una vez; cada proceso nuevo ya lo trae cargado
+    _CONTEXTO_PROCESOS.set_forkserver_preload([__name__])
+
+def _procesar_contenido(nombre_archivo, contenido, tipo_archivo, conservar_documentos=True):
+    """Procesa un archivo a partir de sus bytes (se ejecuta dentro del pool)."""
+    archivo = io.BytesIO(contenido)
+    archivo.name = nombre_archivo
+    return ProcesadorArchivos.procesar_archivo(archivo, tipo_archivo, conservar_documentos=conservar_documentos)
+
+def _procesar_ruta(ruta, tipo_archivo, conservar_documentos=True):
+    """Procesa un archivo en disco; el proceso del pool lo lee directamente."""
+    with open(ruta, 'rb') as archivo:
+        return ProcesadorArchivos.procesar_archivo(archivo, tipo_archivo, conservar_documentos=conservar_documentos)
+
+class IngestorLotes:
+    """Procesa varios archivos a la vez en un pool de procesos o de hilos.
+
+    Acepta archivos subidos (objetos con `.name` y contenido en memoria) o
+    rutas en disco (`str` / `Path`); las rutas se identifican por su ruta completa.
+    """
+
+    def __init__(self, max_workers=None, usar_procesos=True, conservar_documentos=True):
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.usar_procesos = usar_procesos
+        self.conservar_documentos = conservar_documentos
+
+    @staticmethod
+    def _es_ruta(archivo):
+        return isinstance(archivo, (str, os.PathLike))
+
+    @staticmethod
+    def _nombre(archivo):
+        return os.fspath(archivo) if IngestorLotes._es_ruta(archivo) else archivo.name
+
+    def procesar(self, archivos, tipo_archivo, al_progresar=None, cache=None):
+        """Procesa un lote de archivos del mismo tipo.
+
+        Devuelve una lista de (nombre_archivo, info, error) en el mismo orden
+        de `archivos`; un archivo con error no afecta al resto. Si se entrega
+        `al_progresar`, se llama como al_progresar(completados, total, nombre, error)
+        cada vez que termina un archivo. Con `cache` (CacheParseo) solo se
+        procesan los archivos que no estén cacheados.
+        """
+        resultados = {}
+        pendientes = []
+
+        for archivo in archivos:
+            cacheable = cache is not None and not IngestorLotes._es_ruta(archivo)
+            resultado = cache.buscar(archivo, tipo_archivo) if cacheable else None
+            if resultado is None:
+                pendientes.append(archivo)
+            else:
+                resultados[archivo.name] = resultado
+
+        total = len(pendientes)
+        for completados, (archivo, resultado) in enumerate(self._ejecutar(pendientes, tipo_archivo), start=1):
+            nombre = IngestorLotes._nombre(archivo)
+            if cache is not None and not IngestorLotes._es_ruta(archivo):
+                cache.registrar(archivo, tipo_archivo, resultado)
+            resultados[nombre] = resultado
+            if al_progresar is not None:
+                error = resultado if isinstance(resultado, Exception) else None
+                al_progresar(completados, total, nombre, error)
+
+        salida = []
+        for archivo in archivos:
+            nombre = IngestorLotes._nombre(archivo)
+            resultado = resultados[nombre]
+            if isinstance(resultado, Exception):
+                salida.append((nombre, None, resultado))
+            else:
+                salida.append((nombre, resultado, None))
+        return salida
+
+    def _tarea(self, archivo, tipo_archivo):
+        """(función, argumentos) para procesar el archivo dentro o fuera del pool."""
+        if IngestorLotes._es_ruta(archivo):
+            return _procesar_ruta, (archivo, tipo_archivo, self.conservar_documentos)
+        return _procesar_contenido, (archivo.name, leer_contenido(archivo), tipo_archivo, self.conservar_documentos)
+
+    def _ejecutar(self, archivos, tipo_archivo):
+        """Genera (archivo, info o excepción) a medida que terminan."""
+        # Un solo archivo no justifica levantar un pool
+        if len(archivos) <= 1 or self.max_workers == 1:
+            for archivo in archivos:
+                try:
+                    funcion, argumentos = self._tarea(archivo, tipo_archivo)
+                    yield archivo, funcion(*argumentos)
+                except Exception as e:
+                    yield archivo, e
+            return
+
+        workers = min(self.max_workers, len(archivos))
+        if self.usar_procesos:
+            pool = ProcessPoolExecutor(max_workers=workers, mp_context=_CONTEXTO_PROCESOS)
+        else:
+            pool = ThreadPoolExecutor(max_workers=workers)
+        with pool:
+            futuros = {}
+            for archivo in archivos:
+                funcion, argumentos = self._tarea(archivo, tipo_archivo)
+                futuros[pool.submit(funcion, *argumentos)] = archivo
+            for futuro in as_completed(futuros):
+                try:
+                    yield futuros[futuro], futuro.result()
+                except Exception as e:
+                    yield futuros[futuro], e
@@ -0,0 +1,199 @@
+# core/instrumentacion.py
+import functools
+import json
+import os
+import threading
+import time
+import tracemalloc
+from collections import deque
+from contextlib import contextmanager
+
+# Límites (segundos) de los tramos del histograma de latencias; el último tramo es "más de 10 s"
+LIMITES_HISTOGRAMA = (0.001, 0.003, 0.01, 0.03, 0.1, 0.3, 1, 3, 10)
+# Últimas duraciones guardadas por etapa para calcular percentiles
+MUESTRAS_POR_ETAPA = 1000
+
+class EstadisticaEtapa:
+    """Tiempos acumulados de una etapa (función o bloque medido)."""
+
+    def __init__(self):
+        self.llamadas = 0
+        self.segundos = 0.0
+        self.maximo = 0.0
+        self.filas = 0
+        self.memoria = 0
+        self.histograma = [0] * (len(LIMITES_HISTOGRAMA) + 1)
+        self.muestras = deque(maxlen=MUESTRAS_POR_ETAPA)
+
+    def registrar(self, segundos, filas=0, memoria=0):
+        self.llamadas += 1
+        self.segundos += segundos
+        self.maximo = max(self.maximo, segundos)
+        self.filas += filas
+        self.memoria += memoria
+        self.muestras.append(segundos)
+        tramo = 0
+        while tramo < len(LIMITES_HISTOGRAMA) and segundos > LIMITES_HISTOGRAMA[tramo]:
+            tramo += 1
+        self.histograma[tramo] += 1
+
+    def _percentil(self, ordenadas, q):
+        return ordenadas[min(int(q / 100 * len(ordenadas)), len(ordenadas) - 1)]
+
+    def resumen(self):
+        ordenadas = sorted(self.muestras)
+        return {
+            'llamadas': self.llamadas,
+            'total_s': self.segundos,
+            'promedio_ms': self.segundos / self.llamadas * 1000 if self.llamadas else 0,
+            'p50_ms': self._percentil(ordenadas, 50) * 1000 if ordenadas else 0,
+            'p90_ms': self._percentil(ordenadas, 90) * 1000 if ordenadas else 0,
+            'p99_ms': self._percentil(ordenadas, 99) * 1000 if ordenadas else 0,
+            'max_ms': self.maximo * 1000,
+            'filas': self.filas,
+            'filas_por_segundo': self.filas / self.segundos if self.filas and self.segundos else None,
+            'memoria_delta_mb': self.memoria / 1024**2,
+            'histograma': dict(zip(
+                [f'<={limite}s' for limite in LIMITES_HISTOGRAMA] + [f'>{LIMITES_HISTOGRAMA[-1]}s'],
+                self.histograma
+            ))
+        }
+
+# tracemalloc es uno por proceso y lo comparten Instrumentacion y Perfilador: se cuentan los usos y
+# se detiene recién al soltarse el último (y nunca si ya estaba encendido desde fuera)
+_USOS_TRACEMALLOC = 0
+_TRACEMALLOC_PROPIO = False
+_CANDADO_TRACEMALLOC = threading.Lock()
+
+def tomar_tracemalloc():
+    """Registra un uso de tracemalloc, encendiéndolo si hace falta."""
+    global _USOS_TRACEMALLOC, _TRACEMALLOC_PROPIO
+    with _CANDADO_TRACEMALLOC:
+        if _USOS_TRACEMALLOC == 0 and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            _TRACEMALLOC_PROPIO = True
+        _USOS_TRACEMALLOC += 1
+
+def soltar_tracemalloc():
+    """Libera un uso de tracemalloc; con el último lo detiene si lo encendió tomar_tracemalloc."""
+    global _USOS_TRACEMALLOC, _TRACEMALLOC_PROPIO
+    with _CANDADO_TRACEMALLOC:
+        _USOS_TRACEMALLOC -= 1
+        if _USOS_TRACEMALLOC == 0 and _TRACEMALLOC_PROPIO:
+            tracemalloc.stop()
+            _TRACEMALLOC_PROPIO = False
+
+class Instrumentacion:
+    """Registro de latencias por etapa, apagado por defecto.
+
+    Apagado, cada función instrumentada solo paga un `if`. Encendido se
+    registran duración, filas procesadas y (con memoria=True, vía tracemalloc,
+    bastante más lento) la variación de memoria de cada llamada.
+    """
+
+    def __init__(self):
+        self.activa = False
+        self.memoria = False
+        self.etapas = {}
+        self._usa_tracemalloc = False
+        self._candado = threading.Lock()
+
+    def activar(self, memoria=False):
+        """Empieza a registrar (opcionalmente también la memoria)."""
+        self.memoria = memoria
+        if memoria and not self._usa_tracemalloc:
+            tomar_tracemalloc()
+            self._usa_tracemalloc = True
+        elif not memoria and self._usa_tracemalloc:
+            soltar_tracemalloc()
+            self._usa_tracemalloc = False
+        self.activa = True
+
+    def desactivar(self):
+        """Deja de registrar; lo ya medido se conserva."""
+        self.activa = False
+        self.memoria = False
+        if self._usa_tracemalloc:
+            soltar_tracemalloc()
+            self._usa_tracemalloc = False
+
+    def limpiar(self):
+        """Borra todas las mediciones."""
+        with self._candado:
+            self.etapas.clear()
+
+    def registrar(self, etapa, segundos, filas=0, memoria=0):
+        with self._candado:
+            if etapa not in self.etapas:
+                self.etapas[etapa] = EstadisticaEtapa()
+            self.etapas[etapa].registrar(segundos, filas, memoria)
+
+    def _memoria_actual(self):
+        return tracemalloc.get_traced_memory()[0] if self.memoria and tracemalloc.is_tracing() else 0
+
+    @contextmanager
+    def medir(self, etapa):
+        """Mide un bloque: `with INSTRUMENTACION.medir('etapa') as registro: ... registro['filas'] = n`."""
+        registro = {'filas': 0}
+        if not self.activa:
+            yield registro
+            return
+
+        memoria_inicial = self._memoria_actual()
+        inicio = time.perf_counter()
+        try:
+            yield registro
+        finally:
+            self.registrar(etapa, time.perf_counter() - inicio, registro['filas'],
+                           self._memoria_actual() - memoria_inicial)
+
+    def resumen(self):
+        """Resumen por etapa, ordenado por tiempo total."""
+        with self._candado:
+            resumenes = {etapa: estadistica.resumen() for etapa, estadistica in self.etapas.items()}
+        return dict(sorted(resumenes.items(), key=lambda item: -item[1]['total_s']))
+
+    def exportar_json(self):
+        """Resumen como texto JSON."""
+        return json.dumps({
+            'activa': self.activa,
+            'memoria': self.memoria,
+            'etapas': self.resumen()
+        }, ensure_ascii=False, indent=1)
+
+INSTRUMENTACION = Instrumentacion()
+if os.environ.get('SIMULADOR_INSTRUMENTACION'):
+    INSTRUMENTACION.activar(memoria=os.environ['SIMULADOR_INSTRUMENTACION'] == 'memoria')
+
+def largo_primer_argumento(resultado, datos, *args, **kwargs):
+    """Filas de una llamada = len() del primer argumento (serie, documentos, tabla...)."""
+    return len(datos)
+
+def instrumentar(etapa=None, filas=None):
+    """Decorador que registra cada llamada en INSTRUMENTACION.
+
+    `etapa` es el nombre (por defecto el __qualname__ de la función) y
+    `filas(resultado, *args, **kwargs)` devuelve cuántas filas procesó la llamada.
+    """
+    def decorador(funcion):
+        nombre = etapa or funcion.__qualname__
+
+        @functools.wraps(funcion)
+        def envoltura(*args, **kwargs):
+            if not INSTRUMENTACION.activa:
+                return funcion(*args, **kwargs)
+
+            memoria_inicial = INSTRUMENTACION._memoria_actual()
+            inicio = time.perf_counter()
+            resultado = funcion(*args, **kwargs)
+            segundos = time.perf_counter() - inicio
+            INSTRUMENTACION.registrar(
+                nombre,
+                segundos,
+                filas(resultado, *args, **kwargs) if filas is not None else 0,
+                INSTRUMENTACION._memoria_actual() - memoria_inicial
+            )
+            return resultado
+
+        return envoltura
+    return decorador
@@ -0,0 +1,178 @@
+# core/perfilado.py
+import cProfile
+import io
+import itertools
+import marshal
+import os
+import pstats
+import sys
+import threading
+import time
+import tracemalloc
+from collections import deque
+from contextlib import contextmanager
+from datetime import datetime
+from .instrumentacion import soltar_tracemalloc, tomar_tracemalloc
+
+# Perfiles guardados (los más antiguos se descartan)
+MAX_PERFILES = 5
+# Líneas con más memoria asignada que se guardan de cada snapshot de tracemalloc
+LINEAS_MEMORIA = 25
+# Cada cuánto (segundos) se toma una muestra de la pila para el flame graph
+INTERVALO_MUESTREO = 0.005
+
+# Identificadores de los perfiles: no cambian al entrar o salir otros perfiles del buffer
+_IDS_PERFILES = itertools.count(1)
+
+def _nombre_marco(marco):
+    codigo = marco.f_code
+    return f"{codigo.co_name} ({os.path.basename(codigo.co_filename)}:{codigo.co_firstlineno})"
+
+class MuestreadorPilas:
+    """Muestrea la pila de un hilo cada `intervalo` segundos y cuenta pilas "plegadas".
+
+    cProfile solo guarda aristas llamador -> llamado, que no alcanzan para
+    reconstruir pilas completas (los decoradores mezclan todas las llamadas en
+    un mismo nodo); el muestreo sí da las pilas reales para un flame graph.
+    """
+
+    def __init__(self, id_hilo, intervalo=INTERVALO_MUESTREO):
+        self.id_hilo = id_hilo
+        self.intervalo = intervalo
+        self.pilas = {}
+        self._detener = threading.Event()
+        self._hilo = threading.Thread(target=self._muestrear, daemon=True)
+
+    def iniciar(self):
+        self._hilo.start()
+
+    def detener(self):
+        self._detener.set()
+        self._hilo.join()
+
+    def _muestrear(self):
+        while not self._detener.wait(self.intervalo):
+            marco = sys._current_frames().get(self.id_hilo)
+            pila = []
+            while marco is not None:
+                pila.append(_nombre_marco(marco))
+                marco = marco.f_back
+            if pila:
+                clave = ';'.join(reversed(pila))
+                self.pilas[clave] = self.pilas.get(clave, 0) + 1
+
+    def a_plegado(self):
+        """Texto `a;b;c muestras`, el formato de flamegraph.pl y speedscope."""
+        return '\n'.join(f"{pila} {muestras}" for pila, muestras in self.pilas.items())
+
+class PerfilRerun:
+    """Resultado de perfilar una ejecución: estadísticas de cProfile y, opcional, memoria."""
+
+    def __init__(self, etapa, segundos, estadisticas, plegado, memoria=None, memoria_pico=None):
+        self.id = next(_IDS_PERFILES)
+        self.etapa = etapa
+        self.fecha = datetime.now()
+        self.segundos = segundos
+        self.estadisticas = estadisticas
+        self.plegado = plegado
+        self.memoria = memoria
+        self.memoria_pico = memoria_pico
+
+    def nombre_archivo(self, extension):
+        return f"perfil_{self.etapa}_{self.fecha.strftime('%Y%m%d_%H%M%S')}.{extension}"
+
+    def a_pstats(self):
+        """Bytes en el formato de `pstats.Stats.dump_stats` (para snakeviz, pstats, etc.)."""
+        return marshal.dumps(self.estadisticas)
+
+    def a_plegado(self):
+        """Pilas plegadas muestreadas, listas para un flame graph."""
+        return self.plegado
+
+    def funciones_principales(self, cantidad=20, orden='cumulative'):
+        """Listado de pstats con las funciones más costosas."""
+        salida = io.StringIO()
+        stats = pstats.Stats(stream=salida)
+        stats.stats = self.estadisticas
+        stats.get_top_level_stats()
+        stats.sort_stats(orden).print_stats(cantidad)
+        return salida.getvalue()
+
+class Perfilador:
+    """Perfila ejecuciones completas (por ejemplo, una pestaña en un rerun), apagado por defecto.
+
+    Guarda los últimos `max_perfiles` en un buffer circular. cProfile no
+    admite dos perfiles a la vez, así que si otra sesión está perfilando la
+    ejecución actual simplemente no se perfila.
+    """
+
+    def __init__(self, max_perfiles=MAX_PERFILES):
+        self.activo = False
+        self.memoria = False
+        self.perfiles = deque(maxlen=max_perfiles)
+        self._usa_tracemalloc = False
+        self._candado = threading.Lock()
+
+    def activar(self, memoria=False):
+        """Empieza a perfilar (con memoria=True también toma snapshots de tracemalloc)."""
+        self.memoria = memoria
+        if memoria and not self._usa_tracemalloc:
+            tomar_tracemalloc()
+            self._usa_tracemalloc = True
+        elif not memoria and self._usa_tracemalloc:
+            soltar_tracemalloc()
+            self._usa_tracemalloc = False
+        self.activo = True
+
+    def desactivar(self):
+        """Deja de perfilar; los perfiles guardados se conservan."""
+        self.activo = False
+        self.memoria = False
+        if self._usa_tracemalloc:
+            soltar_tracemalloc()
+            self._usa_tracemalloc = False
+
+    def limpiar(self):
+        """Borra los perfiles guardados."""
+        self.perfiles.clear()
+
+    @contextmanager
+    def perfilar(self, etapa, omitir=False):
+        """Perfila el bloque y guarda el resultado: `with PERFILADOR.perfilar('pestana_carga'): ...`.
+
+        Con omitir=True el bloque corre sin perfilar (ejecuciones que no interesa guardar).
+        """
+        if not self.activo or omitir or not self._candado.acquire(blocking=False):
+            yield
+            return
+
+        try:
+            memoria = self.memoria and tracemalloc.is_tracing()
+            if memoria:
+                tracemalloc.reset_peak()
+                inicial = tracemalloc.take_snapshot()
+            perfil = cProfile.Profile()
+            muestreador = MuestreadorPilas(threading.get_ident())
+            inicio = time.perf_counter()
+            muestreador.iniciar()
+            perfil.enable()
+            try:
+                yield
+            finally:
+                # Se guarda también si el bloque termina con excepción (st.rerun, st.stop)
+                perfil.disable()
+                muestreador.detener()
+                segundos = time.perf_counter() - inicio
+                diferencias = pico = None
+                if memoria:
+                    pico = tracemalloc.get_traced_memory()[1]
+                    diferencias = tracemalloc.take_snapshot().compare_to(inicial, 'lineno')[:LINEAS_MEMORIA]
+                perfil.create_stats()
+                self.perfiles.append(PerfilRerun(etapa, segundos, perfil.stats, muestreador.a_plegado(),
+                                                 [str(d) for d in diferencias] if diferencias else None, pico))
+        finally:
+            self._candado.release()
+
+PERFILADOR = Perfilador()
+if os.environ.get('SIMULADOR_PERFILADO'):
+    PERFILADOR.activar(memoria=os.environ['SIMULADOR_PERFILADO'] == 'memoria')
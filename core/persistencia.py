@@ -0,0 +1,178 @@
+# core/persistencia.py
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+import numpy as np
+from .documentos import ColeccionDocumentos
+
+try:
+    import fcntl
+except ImportError:  # Windows: solo se coordinan las sesiones del mismo proceso
+    fcntl = None
+
+DIRECTORIO_POR_DEFECTO = os.environ.get('SIMULADOR_DATOS', '.simulador_datos')
+
+# Las sesiones de Streamlit son hilos del mismo proceso: el candado de archivo no basta en todas las plataformas
+_CANDADO_INDICE = threading.Lock()
+
+class AlmacenDocumentos:
+    """Almacén local de archivos procesados, persistente entre sesiones.
+
+    Cada archivo se guarda en su propia carpeta con una columna por archivo
+    `.npy` (formato columnar de NumPy) y un `indice.json` guarda los metadatos
+    y el período asignado. Al cargar, las columnas se abren con `mmap_mode='r'`,
+    así que solo se leen del disco las páginas que realmente se usan.
+
+    Varias sesiones pueden guardar a la vez: cada cambio al índice (leer,
+    modificar, reescribir) se hace bajo un candado y el archivo se reemplaza
+    de forma atómica.
+    """
+
+    COLUMNAS = ('fechas', 'montos', 'tipos_doc', 'codigos_tipo', 'codigos_archivo')
+    # Identidad de los documentos: los archivos guardados antes de existir no las tienen
+    COLUMNAS_OPCIONALES = ('folios', 'claves')
+    CAMPOS_FECHA = ('fecha_minima', 'fecha_maxima')
+
+    def __init__(self, directorio=DIRECTORIO_POR_DEFECTO):
+        self.directorio = Path(directorio)
+        self.ruta_indice = self.directorio / 'indice.json'
+
+    def _leer_indice(self):
+        if not self.ruta_indice.exists():
+            return {}
+        with open(self.ruta_indice, encoding='utf-8') as f:
+            return json.load(f)
+
+    def _escribir_indice(self, indice):
+        # Temporal con nombre propio: dos escrituras nunca comparten el mismo archivo a medio escribir
+        descriptor, temporal = tempfile.mkstemp(dir=self.directorio, prefix='indice.', suffix='.tmp')
+        try:
+            with os.fdopen(descriptor, 'w', encoding='utf-8') as f:
+                json.dump(indice, f, ensure_ascii=False, indent=1)
+            os.replace(temporal, self.ruta_indice)
+        except BaseException:
+            Path(temporal).unlink(missing_ok=True)
+            raise
+
+    @contextmanager
+    def _bloqueo(self):
+        """Acceso exclusivo al índice entre hilos y, con fcntl, entre procesos."""
+        self.directorio.mkdir(parents=True, exist_ok=True)
+        with _CANDADO_INDICE, open(self.directorio / 'indice.lock', 'a') as candado:
+            if fcntl is not None:
+                fcntl.flock(candado, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(candado, fcntl.LOCK_UN)
+
+    @staticmethod
+    def _carpeta(nombre_archivo):
+        return hashlib.blake2b(nombre_archivo.encode('utf-8'), digest_size=8).hexdigest()
+
+    def guardar(self, nombre_archivo, info, periodo):
+        """Guarda un archivo procesado junto con su período asignado."""
+        carpeta = AlmacenDocumentos._carpeta(nombre_archivo)
+        destino = self.directorio / 'archivos' / carpeta
+        destino.parent.mkdir(parents=True, exist_ok=True)
+        # Las columnas se escriben fuera del candado, en una carpeta temporal propia de esta escritura
+        temporal = Path(tempfile.mkdtemp(dir=destino.parent, prefix=f'{carpeta}.', suffix='.tmp'))
+
+        documentos = info['documentos']
+        try:
+            for columna in AlmacenDocumentos.COLUMNAS + AlmacenDocumentos.COLUMNAS_OPCIONALES:
+                np.save(temporal / f'{columna}.npy', getattr(documentos, columna))
+        except BaseException:
+            shutil.rmtree(temporal, ignore_errors=True)
+            raise
+
+        metadatos = {k: v for k, v in info.items() if k != 'documentos'}
+        for campo in AlmacenDocumentos.CAMPOS_FECHA:
+            metadatos[campo] = metadatos[campo].isoformat()
+
+        with self._bloqueo():
+            shutil.rmtree(destino, ignore_errors=True)
+            os.replace(temporal, destino)
+
+            indice = self._leer_indice()
+            indice[nombre_archivo] = {
+                'carpeta': carpeta,
+                'periodo': periodo,
+                'archivos': documentos.archivos,
+                'info': metadatos
+            }
+            self._escribir_indice(indice)
+
+    def actualizar_periodo(self, nombre_archivo, periodo):
+        """Cambia el período asignado de un archivo ya guardado."""
+        with self._bloqueo():
+            indice = self._leer_indice()
+            if nombre_archivo in indice:
+                indice[nombre_archivo]['periodo'] = periodo
+                self._escribir_indice(indice)
+
+    def eliminar(self, nombre_archivo):
+        """Elimina un archivo del almacén."""
+        with self._bloqueo():
+            indice = self._leer_indice()
+            entrada = indice.pop(nombre_archivo, None)
+            if entrada is None:
+                return
+            shutil.rmtree(self.directorio / 'archivos' / entrada['carpeta'], ignore_errors=True)
+            self._escribir_indice(indice)
+
+    def cargar(self):
+        """Devuelve (archivos_procesados, periodos_asignados) con las columnas mapeadas en memoria."""
+        archivos_procesados = {}
+        periodos_asignados = {}
+
+        for nombre_archivo, entrada in self._leer_indice().items():
+            carpeta = self.directorio / 'archivos' / entrada['carpeta']
+            try:
+                columnas = [
+                    np.load(carpeta / f'{columna}.npy', mmap_mode='r')
+                    for columna in AlmacenDocumentos.COLUMNAS
+                ]
+                opcionales = [
+                    np.load(carpeta / f'{columna}.npy', mmap_mode='r') if (carpeta / f'{columna}.npy').exists() else None
+                    for columna in AlmacenDocumentos.COLUMNAS_OPCIONALES
+                ]
+            except (OSError, ValueError):
+                # Carpeta incompleta o dañada: se omite ese archivo
+                continue
+
+            info = dict(entrada['info'])
+            for campo in AlmacenDocumentos.CAMPOS_FECHA:
+                info[campo] = datetime.fromisoformat(info[campo])
+            info['documentos'] = ColeccionDocumentos(*columnas, entrada['archivos'], *opcionales)
+
+            archivos_procesados[nombre_archivo] = info
+            periodos_asignados[nombre_archivo] = entrada['periodo']
+
+        return archivos_procesados, periodos_asignados
+
+    def limpiar(self):
+        """Elimina todo el contenido del almacén."""
+        # Se conserva indice.lock: otra sesión puede estar esperándolo
+        with self._bloqueo():
+            shutil.rmtree(self.directorio / 'archivos', ignore_errors=True)
+            self.ruta_indice.unlink(missing_ok=True)
+
+    def estadisticas(self):
+        """Cantidad de archivos y espacio usado en disco."""
+        carpeta_archivos = self.directorio / 'archivos'
+        bytes_en_disco = 0
+        if carpeta_archivos.exists():
+            bytes_en_disco = sum(p.stat().st_size for p in carpeta_archivos.rglob('*.npy'))
+        return {
+            'archivos': len(self._leer_indice()),
+            'bytes': bytes_en_disco,
+            'directorio': str(self.directorio.resolve())
+        }
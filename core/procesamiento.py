@@ -1,112 +1,286 @@
 # core/procesamiento.py
+import importlib.util
+import numpy as np
 import pandas as pd
-from collections import defaultdict
-from datetime import datetime
-from .utils import normalizar_columnas, parsear_fecha, convertir_monto
+from .documentos import ColeccionDocumentos
+from .esquema import COLUMNAS_REQUERIDAS, sondear_esquema
+from .estadisticas import AcumuladorEstadisticas
+from .instrumentacion import instrumentar, largo_primer_argumento
+from .utils import claves_documentos, normalizar_folios, parsear_fechas_serie, normalizar_montos, separadores_montos
+
+# Filas por bloque al leer CSV: acota la memoria usada sin importar el tamaño del archivo
+TAMAÑO_BLOQUE_CSV = 250_000
+
+# Filas del inicio del archivo de las que se deducen los separadores de montos; los primeros
+# bloques se juntan hasta tenerlas, así el resultado no depende del tamaño de bloque
+FILAS_DETECCION = 2000
+
+# Motor opcional para Excel (pip install python-calamine), bastante más rápido que openpyxl
+MOTOR_EXCEL_RAPIDO = 'calamine' if importlib.util.find_spec('python_calamine') else None
+
+class AcumuladorArchivo:
+    """Agregados de un archivo que se actualizan bloque a bloque."""
+    
+    def __init__(self, conservar_documentos=True):
+        self.conservar_documentos = conservar_documentos
+        self.bloques = []
+        # Conteo por año-mes (meses desde 1970) en orden de primera aparición
+        self.conteo_meses = {}
+        self.fecha_minima = None
+        self.fecha_maxima = None
+        self.total_monto = 0.0
+        self.cantidad = 0
+        self.montos_invalidos = 0
+        # Montos y conteos separando notas de crédito: [otros, tipo 61]
+        self.montos_nc = [0.0, 0.0]
+        self.conteos_nc = [0, 0]
+        self.estadisticas = AcumuladorEstadisticas()
+    
+    def agregar(self, fechas, montos, tipos_doc, montos_invalidos=0, folios=None, claves=None):
+        """Incorpora un bloque de documentos válidos (fechas datetime64[ns]; folios y claves si el archivo los trae)."""
+        if len(fechas) == 0:
+            return
+        
+        meses, primera_aparicion, conteos = np.unique(
+            fechas.astype('datetime64[M]').astype(np.int64), return_index=True, return_counts=True
+        )
+        for posicion in np.argsort(primera_aparicion):
+            mes = int(meses[posicion])
+            self.conteo_meses[mes] = self.conteo_meses.get(mes, 0) + int(conteos[posicion])
+        
+        fecha_min, fecha_max = fechas.min(), fechas.max()
+        self.fecha_minima = fecha_min if self.fecha_minima is None else min(self.fecha_minima, fecha_min)
+        self.fecha_maxima = fecha_max if self.fecha_maxima is None else max(self.fecha_maxima, fecha_max)
+        self.total_monto += float(montos.sum())
+        self.cantidad += len(fechas)
+        self.montos_invalidos += montos_invalidos
+        
+        es_nota_credito = tipos_doc == 61
+        conteo_nc = int(es_nota_credito.sum())
+        self.montos_nc[0] += float(montos[~es_nota_credito].sum())
+        self.montos_nc[1] += float(montos[es_nota_credito].sum())
+        self.conteos_nc[0] += len(fechas) - conteo_nc
+        self.conteos_nc[1] += conteo_nc
+        self.estadisticas.agregar(montos)
+        
+        if self.conservar_documentos:
+            self.bloques.append((fechas, montos, tipos_doc, folios, claves))
+    
+    def año_mes_predominante(self):
+        """Año-mes más frecuente (en empate, el que apareció primero)."""
+        # Un mes por entrada, pesado por sus documentos y en orden de primera aparición
+        meses = np.array(list(self.conteo_meses), dtype=np.int64).astype('datetime64[M]')
+        return ProcesadorArchivos.detectar_año_mes_predominante(meses, list(self.conteo_meses.values()))
+    
+    def documentos(self, tipo_archivo, nombre_archivo):
+        """Une los bloques conservados en una ColeccionDocumentos."""
+        if not self.conservar_documentos:
+            return None
+        
+        con_identidad = all(b[4] is not None for b in self.bloques)
+        return ColeccionDocumentos.desde_archivo(
+            np.concatenate([b[0] for b in self.bloques]),
+            np.concatenate([b[1] for b in self.bloques]),
+            np.concatenate([b[2] for b in self.bloques]),
+            tipo_archivo,
+            nombre_archivo,
+            np.concatenate([b[3] for b in self.bloques]) if con_identidad else None,
+            np.concatenate([b[4] for b in self.bloques]) if con_identidad else None
+        )
+
 
 class ProcesadorArchivos:
     """Clase para procesar archivos de ventas y compras."""
     
     @staticmethod
-    def detectar_año_mes_predominante(fechas):
-        """Detecta el año-mes que predomina en las fechas."""
-        if not fechas:
+    def detectar_año_mes_predominante(fechas, pesos=None):
+        """Detecta el año-mes que predomina en las fechas.
+        
+        Con `pesos` cada fecha cuenta tantas veces como su peso (p. ej. un mes
+        y la cantidad de documentos que tiene).
+        """
+        fechas = np.asarray(fechas, dtype='datetime64[ns]')
+        validas = ~np.isnat(fechas)
+        fechas = fechas[validas]
+        if len(fechas) == 0:
             return None, None, 0
         
         # Contar por año-mes
-        contador = defaultdict(int)
-        
-        for fecha in fechas:
-            año_mes = f"{fecha.year}-{fecha.month:02d}"
-            contador[año_mes] += 1
+        meses, primera_aparicion, inversos = np.unique(
+            fechas.astype('datetime64[M]'), return_index=True, return_inverse=True
+        )
+        pesos = None if pesos is None else np.asarray(pesos, dtype=np.int64)[validas]
+        conteos = np.bincount(inversos, weights=pesos, minlength=len(meses)).astype(np.int64)
         
-        # Encontrar el año-mes más común
-        if not contador:
-            return None, None, 0
-        
-        año_mes_comun, cantidad = max(contador.items(), key=lambda x: x[1])
+        # Encontrar el año-mes más común (en empate, el que aparece primero)
+        empatados = np.flatnonzero(conteos == conteos.max())
+        ganador = empatados[np.argmin(primera_aparicion[empatados])]
         
         # Extraer año y mes
-        año_str, mes_str = año_mes_comun.split('-')
-        return int(año_str), int(mes_str), cantidad
+        meses_desde_1970 = int(meses[ganador].astype(np.int64))
+        return 1970 + meses_desde_1970 // 12, meses_desde_1970 % 12 + 1, int(conteos[ganador])
+    
+    @staticmethod
+    def convertir_tipos_documento(serie):
+        """Convierte la columna tipo_documento a enteros (0 si no es numérico)."""
+        numeros = pd.to_numeric(serie, errors='coerce').astype('float64').to_numpy()
+        numeros = np.where(np.isfinite(numeros), numeros, 0)
+        return np.trunc(numeros).astype(np.int64)
     
     @staticmethod
-    def procesar_archivo(archivo, tipo_archivo):
-        """Procesa un archivo y extrae la información."""
+    def _leer_bloques(archivo, tamaño_bloque, esquema):
+        """Genera DataFrames con solo las columnas requeridas (CSV y Excel por bloques).
+        
+        `esquema` (ver sondear_esquema) indica qué columnas leer y cómo se llaman.
+        """
+        if archivo.name.endswith('.csv'):
+            lector = pd.read_csv(archivo, sep=';', decimal=',', chunksize=tamaño_bloque,
+                                 usecols=esquema.usecols, dtype=esquema.dtype)
+            with lector:
+                for bloque in lector:
+                    bloque.columns = esquema.columnas
+                    yield bloque
+        else:
+            yield from ProcesadorArchivos._leer_excel(archivo, tamaño_bloque, esquema)
+    
+    @staticmethod
+    def _leer_excel(archivo, tamaño_bloque, esquema):
+        """Lee solo las columnas requeridas de un Excel.
+        
+        Usa python-calamine si está instalado; si no, recorre las filas de un
+        .xlsx con openpyxl en modo read_only, sin cargar el libro completo.
+        """
+        if MOTOR_EXCEL_RAPIDO or not archivo.name.endswith(('.xlsx', '.xlsm')):
+            df = pd.read_excel(archivo, engine=MOTOR_EXCEL_RAPIDO, usecols=esquema.usecols)
+            df.columns = esquema.columnas
+            yield df
+            return
+        
+        # openpyxl se importa recién aquí: cuesta más de 100 ms y solo hace falta para .xlsx
+        import openpyxl
+        libro = openpyxl.load_workbook(archivo, read_only=True, data_only=True)
         try:
-            # Leer archivo según extensión
-            if archivo.name.endswith('.csv'):
-                df = pd.read_csv(archivo, sep=';', decimal=',')
-            else:
-                df = pd.read_excel(archivo)
+            filas = libro.worksheets[0].iter_rows(values_only=True)
+            next(filas, None)  # encabezado, ya resuelto en el esquema
+            columnas = esquema.columnas
+            indices = esquema.usecols
             
-            df = normalizar_columnas(df)
+            bloque = []
+            for fila in filas:
+                bloque.append([fila[i] if i < len(fila) else None for i in indices])
+                if len(bloque) >= tamaño_bloque:
+                    yield pd.DataFrame(bloque, columns=columnas)
+                    bloque = []
             
-            # Verificar columnas requeridas
-            columnas_requeridas = ['fecha_docto', 'tipo_documento', 'monto_total']
-            columnas_faltantes = [c for c in columnas_requeridas if c not in df.columns]
-            
-            if columnas_faltantes:
-                raise ValueError(f"Faltan columnas: {columnas_faltantes}")
-            
-            # Procesar documentos
-            documentos = []
-            fechas_validas = []
+            if bloque:
+                yield pd.DataFrame(bloque, columns=columnas)
+        finally:
+            libro.close()
+    
+    @staticmethod
+    def _juntar_bloques_iniciales(bloques, filas_minimas):
+        """Une los primeros bloques hasta sumar `filas_minimas` filas; el resto pasa tal cual."""
+        bloques = iter(bloques)
+        iniciales, filas = [], 0
+        for bloque in bloques:
+            iniciales.append(bloque)
+            filas += len(bloque)
+            if filas >= filas_minimas:
+                break
+        
+        if len(iniciales) == 1:
+            yield iniciales[0]
+        elif iniciales:
+            yield pd.concat(iniciales, ignore_index=True)
+        yield from bloques
+    
+    @staticmethod
+    @instrumentar(filas=largo_primer_argumento)
+    def _procesar_bloque(df, formato_fecha=None, separadores=None):
+        """Convierte un bloque a arreglos de documentos con fecha válida."""
+        # Verificar columnas requeridas
+        columnas_faltantes = [c for c in COLUMNAS_REQUERIDAS if c not in df.columns]
+        
+        if columnas_faltantes:
+            raise ValueError(f"Faltan columnas: {columnas_faltantes}")
+        
+        # Procesar documentos por columnas completas
+        tipos_doc = ProcesadorArchivos.convertir_tipos_documento(df['tipo_documento'])
+        montos, montos_invalidos = normalizar_montos(df['monto_total'], separadores)
+        montos = montos.to_numpy()
+        fechas, formato_fecha = parsear_fechas_serie(df['fecha_docto'], formato_fecha)
+        fechas = fechas.to_numpy()
+        
+        # Notas de crédito (tipo 61) restan
+        montos = np.where(tipos_doc == 61, -montos, montos)
+        
+        validas = ~np.isnat(fechas)
+        
+        # Identidad (folio + RUT) para detectar el mismo documento en otro archivo
+        folios = claves = None
+        if 'folio' in df.columns:
+            folios = normalizar_folios(df['folio'])
+            claves = claves_documentos(tipos_doc, folios, df['rut'] if 'rut' in df.columns else None)[validas]
+            folios = folios[validas]
+        
+        return (
+            fechas[validas],
+            montos[validas],
+            tipos_doc[validas],
+            int(montos_invalidos.to_numpy()[validas].sum()),
+            formato_fecha,
+            folios,
+            claves
+        )
+    
+    @staticmethod
+    @instrumentar(filas=lambda info, *args, **kwargs: info['documentos_count'])
+    def procesar_archivo(archivo, tipo_archivo, tamaño_bloque=TAMAÑO_BLOQUE_CSV, conservar_documentos=True):
+        """Procesa un archivo y extrae la información.
+        
+        Los CSV se leen de a `tamaño_bloque` filas y los agregados se van
+        acumulando, así que la memoria no crece con el tamaño del texto. Con
+        conservar_documentos=False solo se calculan los agregados y
+        info['documentos'] queda en None.
+        """
+        try:
+            # Solo el encabezado: un archivo equivocado se rechaza antes de leerlo entero
+            esquema = sondear_esquema(archivo).validar()
+            acumulador = AcumuladorArchivo(conservar_documentos)
+            formato_fecha = separadores = None
+            bloques = ProcesadorArchivos._juntar_bloques_iniciales(
+                ProcesadorArchivos._leer_bloques(archivo, tamaño_bloque, esquema), FILAS_DETECCION
+            )
             
-            for _, fila in df.iterrows():
-                # Tipo de documento
-                try:
-                    tipo_doc_val = fila.get('tipo_documento', 0)
-                    if pd.isna(tipo_doc_val):
-                        tipo_doc = 0
-                    else:
-                        tipo_doc = int(float(tipo_doc_val))
-                except:
-                    tipo_doc = 0
-                
-                factor = -1 if tipo_doc == 61 else 1
-                
-                # Monto total
-                monto_raw = fila.get('monto_total', 0)
-                monto_total = convertir_monto(monto_raw)
-                
-                # Fecha
-                fecha_raw = fila.get('fecha_docto', '')
-                fecha_dt = parsear_fecha(fecha_raw)
-                
-                if fecha_dt:
-                    documentos.append({
-                        'fecha': fecha_dt,
-                        'monto': monto_total * factor,
-                        'tipo': tipo_archivo,
-                        'tipo_doc': tipo_doc,
-                        'archivo_origen': archivo.name
-                    })
-                    fechas_validas.append(fecha_dt)
+            for df in bloques:
+                # El formato de fecha y los separadores de montos del primer bloque se reutilizan en los siguientes
+                if separadores is None:
+                    separadores = separadores_montos(df['monto_total'].iloc[:FILAS_DETECCION])
+                (fechas, montos, tipos_doc, montos_invalidos,
+                 formato_fecha, folios, claves) = ProcesadorArchivos._procesar_bloque(df, formato_fecha, separadores)
+                acumulador.agregar(fechas, montos, tipos_doc, montos_invalidos, folios, claves)
             
-            if not documentos:
+            if acumulador.cantidad == 0:
                 raise ValueError("No se encontraron documentos con fecha válida")
             
             # Detectar año-mes predominante
-            año_pred, mes_pred, cantidad = ProcesadorArchivos.detectar_año_mes_predominante(fechas_validas)
-            
-            # Calcular estadísticas
-            fecha_min = min(fechas_validas)
-            fecha_max = max(fechas_validas)
-            total_monto = sum(d['monto'] for d in documentos)
+            año_pred, mes_pred, cantidad = acumulador.año_mes_predominante()
             
             return {
-                'documentos': documentos,
-                'fechas_validas': fechas_validas,
+                'documentos': acumulador.documentos(tipo_archivo, archivo.name),
                 'año_predominante': año_pred,
                 'mes_predominante': mes_pred,
                 'cantidad_predominante': cantidad,
-                'fecha_minima': fecha_min,
-                'fecha_maxima': fecha_max,
-                'total_monto': total_monto,
+                'fecha_minima': pd.Timestamp(acumulador.fecha_minima).to_pydatetime(),
+                'fecha_maxima': pd.Timestamp(acumulador.fecha_maxima).to_pydatetime(),
+                'total_monto': acumulador.total_monto,
                 'nombre_archivo': archivo.name,
                 'tipo_archivo': tipo_archivo,
-                'documentos_count': len(documentos)
+                'formato_fecha': formato_fecha,
+                'montos_invalidos': acumulador.montos_invalidos,
+                'agregados': {'montos': acumulador.montos_nc, 'conteos': acumulador.conteos_nc},
+                'estadisticas': acumulador.estadisticas.a_dict(),
+                'documentos_count': acumulador.cantidad
             }
             
         except Exception as e:
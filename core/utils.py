@@ -1,6 +1,36 @@
 # core/utils.py
+import re
+import numpy as np
 import pandas as pd
 from datetime import datetime
+from functools import lru_cache
+from .instrumentacion import instrumentar, largo_primer_argumento
+
+FORMATOS_FECHA = [
+    '%Y-%m-%d', '%d/%m/%Y', '%d-%m-%Y', '%Y%m%d', '%d.%m.%Y',
+    '%Y/%m/%d', '%m/%d/%Y'
+]
+
+# Años representables en datetime64[ns] (1677-09-21 a 2262-04-11), sin los extremos incompletos
+AÑO_MINIMO, AÑO_MAXIMO = 1678, 2261
+
+# Períodos que se pueden asignar a mano: AAAA-MM con mes 01 a 12
+PATRON_PERIODO = re.compile(r'\d{4}-(0[1-9]|1[0-2])')
+
+def leer_contenido(archivo):
+    """Devuelve los bytes de un archivo subido sin mover su posición de lectura."""
+    if hasattr(archivo, 'getvalue'):
+        return archivo.getvalue()
+    
+    posicion = archivo.tell()
+    archivo.seek(0)
+    contenido = archivo.read()
+    archivo.seek(posicion)
+    return contenido
+
+def normalizar_nombre_columna(nombre):
+    """Normaliza un nombre de columna igual que normalizar_columnas."""
+    return str(nombre).strip().lower().replace(' ', '_').replace('.', '')
 
 def normalizar_columnas(df):
     """Normaliza nombres de columnas."""
@@ -20,53 +50,222 @@ def parsear_fecha(fecha_str):
     if pd.isna(fecha_str) or fecha_str in ['', 'nan', 'NaT', 'None']:
         return None
     
-    fecha_str = str(fecha_str).strip()
-    
-    formatos = [
-        '%Y-%m-%d', '%d/%m/%Y', '%d-%m-%Y', '%Y%m%d', '%d.%m.%Y',
-        '%Y/%m/%d', '%m/%d/%Y'
-    ]
-    
-    for formato in formatos:
+    return _parsear_texto_fecha(str(fecha_str).strip())
+
+@lru_cache(maxsize=8192)
+def _parsear_texto_fecha(fecha_str):
+    """Prueba los formatos conocidos en orden (resultado cacheado por texto)."""
+    for formato in FORMATOS_FECHA:
         try:
             return datetime.strptime(fecha_str, formato)
-        except:
+        except ValueError:
             continue
     
-    try:
-        numeros = ''.join(filter(str.isdigit, fecha_str))
-        if len(numeros) >= 8:
+    numeros = ''.join(filter(str.isdigit, fecha_str))
+    if len(numeros) >= 8:
+        try:
             return datetime.strptime(numeros[:8], '%Y%m%d')
-    except:
-        pass
+        except ValueError:
+            pass
     
     return None
 
 def convertir_monto(monto):
     """Convierte monto a float de forma segura."""
-    if pd.isna(monto):
-        return 0
+    valores, _ = normalizar_montos(pd.Series([monto], dtype=object))
+    return float(valores.iloc[0])
+
+def _serie_a_texto(serie):
+    """Convierte una columna a texto sin espacios, con '' en los valores nulos."""
+    texto = serie.astype(object).where(serie.notna(), '')
+    return texto.astype(str).str.strip()
+
+def _muestra(serie, tamaño_muestra):
+    """Muestra de valores repartidos uniformemente a lo largo de la serie."""
+    if len(serie) <= tamaño_muestra:
+        return serie
+    posiciones = np.linspace(0, len(serie) - 1, tamaño_muestra).astype(int)
+    return serie.iloc[posiciones]
+
+@instrumentar()
+def detectar_formato_fecha(textos, tamaño_muestra=200, pesos=None):
+    """Detecta el formato de FORMATOS_FECHA que más valores de la muestra reconoce.
+    
+    Con `pesos` (p. ej. cuántas filas tiene cada texto distinto) cada valor
+    cuenta según su peso, así el formato dominante es el de más filas.
+    """
+    textos = pd.Series(textos, dtype=object).reset_index(drop=True)
+    pesos = pd.Series(1 if pesos is None else np.asarray(pesos), index=textos.index)
+    textos = _muestra(textos, tamaño_muestra)
+    pesos = pesos[textos.index]
+    
+    mejor_formato, mejor_cantidad = None, 0
+    for formato in FORMATOS_FECHA:
+        reconocidos = pd.to_datetime(textos, format=formato, errors='coerce').notna()
+        cantidad = pesos[reconocidos].sum()
+        # En empate gana el formato que aparece primero en FORMATOS_FECHA
+        if cantidad > mejor_cantidad:
+            mejor_formato, mejor_cantidad = formato, cantidad
+        # Ningún formato posterior puede superar a uno que reconoce toda la muestra
+        if reconocidos.all():
+            break
+    
+    return mejor_formato
+
+def _en_rango_ns(fechas):
+    """Serie datetime (de cualquier resolución) como datetime64[ns], con NaT en años fuera de rango."""
+    fuera_de_rango = (fechas.dt.year < AÑO_MINIMO) | (fechas.dt.year > AÑO_MAXIMO)
+    return fechas.mask(fuera_de_rango).astype('datetime64[ns]')
+
+@instrumentar(filas=largo_primer_argumento)
+def parsear_fechas_serie(serie, formato=None):
+    """Versión vectorizada de parsear_fecha.
+    
+    Devuelve (fechas, formato): fechas es datetime64 con NaT donde no hay fecha
+    y formato es el formato dominante detectado ('datetime' si la columna ya
+    venía como fecha, None si no se reconoció ninguno). Si se entrega `formato`
+    (p. ej. el detectado en un bloque anterior) se omite la detección.
+    """
+    if pd.api.types.is_datetime64_any_dtype(serie):
+        if serie.dt.tz is not None:
+            serie = serie.dt.tz_localize(None)
+        return _en_rango_ns(serie.dt.normalize()), 'datetime'
+    
+    # Se parsea cada texto distinto una sola vez
+    codigos, unicos = pd.factorize(_serie_a_texto(serie))
+    unicos = pd.Series(unicos, dtype=object)
+    fechas_unicas = pd.Series(pd.NaT, index=unicos.index, dtype='datetime64[ns]')
+    no_vacios = unicos.ne('')
+    
+    if formato is None or formato not in FORMATOS_FECHA:
+        filas_por_texto = np.bincount(codigos[codigos >= 0], minlength=len(unicos))
+        formato = detectar_formato_fecha(unicos[no_vacios], pesos=filas_por_texto[no_vacios.to_numpy()])
+    if formato:
+        # pandas puede devolver años fuera del rango de datetime64[ns] ('3000-01-01', '05/01/0024'): quedan NaT
+        fechas_unicas[no_vacios] = _en_rango_ns(pd.to_datetime(unicos[no_vacios], format=formato, errors='coerce'))
+    
+    # Los textos que no calzan con el formato dominante se parsean uno a uno
+    pendientes = no_vacios & fechas_unicas.isna()
+    if pendientes.any():
+        convertidas = [_parsear_texto_fecha(texto) for texto in unicos[pendientes]]
+        fechas_unicas[pendientes] = pd.to_datetime(
+            pd.Series([f if f is not None and AÑO_MINIMO <= f.year <= AÑO_MAXIMO else None for f in convertidas],
+                      dtype=object),
+            errors='coerce'
+        ).to_numpy()
+    
+    fechas = pd.Series(fechas_unicas.to_numpy()[codigos], index=serie.index)
+    return fechas, formato
+
+_TEXTOS_NULOS = ['', 'nan', 'none', 'null']
+
+@instrumentar()
+def detectar_separadores(textos, tamaño_muestra=2000):
+    """Detecta (separador_miles, separador_decimal) de una columna de montos en texto."""
+    textos = _muestra(textos, tamaño_muestra)
+    con_punto = textos.str.contains('.', regex=False)
+    con_coma = textos.str.contains(',', regex=False)
+    
+    # Si hay montos con ambos, el que aparece al final es el decimal: 1.234,56 / 1,234.56
+    ambos = textos[con_punto & con_coma]
+    if len(ambos):
+        coma_decimal = (ambos.str.rfind(',') > ambos.str.rfind('.')).mean() >= 0.5
+        return ('.', ',') if coma_decimal else (',', '.')
+    
+    # Solo comas: decimal (1234,56) salvo que agrupen miles (1,234,567)
+    if con_coma.any():
+        if textos[con_coma].str.fullmatch(r'-?\d{1,3}(,\d{3}){2,}').any():
+            return (',', '.')
+        return ('.', ',')
+    
+    # Solo puntos: miles si todos agrupan de a tres (1.234 / 1.234.567)
+    if con_punto.any():
+        if textos[con_punto].str.fullmatch(r'-?\d{1,3}(\.\d{3})+').all():
+            return ('.', ',')
+        return (',', '.')
+    
+    return (',', '.')
+
+def _es_columna_numerica(serie):
+    return pd.api.types.is_numeric_dtype(serie) and not pd.api.types.is_bool_dtype(serie)
+
+def _celdas_numericas(serie):
+    """Celdas que ya son números (p. ej. Excel con columnas mixtas)."""
+    if serie.dtype != object:
+        return pd.Series(False, index=serie.index)
+    return serie.map(type).isin([int, float, np.int64, np.float64])
+
+def _textos_montos(serie):
+    """Montos en texto sin símbolos de moneda ni espacios, sin las celdas vacías."""
+    texto = _serie_a_texto(serie)
+    texto = texto.str.replace(r'[$€£\s]', '', regex=True)
+    return texto[~texto.str.lower().isin(_TEXTOS_NULOS)]
+
+def separadores_montos(serie):
+    """(separador_miles, separador_decimal) de una columna de montos, o None si no trae montos en texto."""
+    if _es_columna_numerica(serie):
+        return None
+    texto = _textos_montos(serie[~_celdas_numericas(serie)])
+    return detectar_separadores(texto) if len(texto) else None
+
+@instrumentar(filas=largo_primer_argumento)
+def normalizar_montos(serie, separadores=None):
+    """Convierte una columna de montos a float64 en una sola pasada.
+    
+    Quita símbolos de moneda y espacios, detecta los separadores de miles y
+    decimales de la columna y devuelve (montos, invalidos): montos es float64
+    con 0 en celdas vacías o no convertibles, e invalidos marca las celdas con
+    texto que no se pudo convertir. Si se entregan `separadores` (p. ej. los
+    de separadores_montos sobre el inicio del archivo) se omite la detección.
+    """
+    if _es_columna_numerica(serie):
+        return serie.astype('float64').fillna(0.0), pd.Series(False, index=serie.index)
     
-    if isinstance(monto, (int, float)):
-        return float(monto)
+    montos = pd.Series(0.0, index=serie.index)
+    invalidos = pd.Series(False, index=serie.index)
     
-    monto_str = str(monto).strip()
+    # Celdas que ya son números se usan tal cual
+    es_numero = _celdas_numericas(serie)
+    if es_numero.any():
+        montos[es_numero] = serie[es_numero].astype('float64').fillna(0.0)
     
-    if not monto_str or monto_str.lower() in ['nan', 'none', 'null']:
-        return 0
+    texto = _textos_montos(serie[~es_numero])
+    if texto.empty:
+        return montos, invalidos
     
-    # Formato 1.000,00 -> 1000.00
-    if '.' in monto_str and ',' in monto_str:
-        monto_str = monto_str.replace('.', '').replace(',', '.')
-    elif ',' in monto_str:
-        monto_str = monto_str.replace(',', '.')
+    miles, decimal = separadores or detectar_separadores(texto)
+    texto = texto.str.replace(miles, '', regex=False)
+    if decimal != '.':
+        texto = texto.str.replace(decimal, '.', regex=False)
     
-    monto_str = monto_str.replace('$', '').replace('€', '').replace('£', '').strip()
+    convertidos = pd.to_numeric(texto, errors='coerce').astype('float64')
+    montos[texto.index] = convertidos.fillna(0.0)
+    invalidos[texto.index] = convertidos.isna()
     
-    try:
-        return float(monto_str)
-    except:
-        return 0
+    return montos, invalidos
+
+def normalizar_folios(serie):
+    """Folios como int64, con -1 donde no hay un número de folio válido."""
+    numeros = pd.to_numeric(serie, errors='coerce').astype('float64').to_numpy()
+    validos = np.isfinite(numeros) & (numeros >= 0)
+    return np.where(validos, np.trunc(np.where(validos, numeros, 0)), -1).astype(np.int64)
+
+@instrumentar(filas=lambda resultado, tipos_doc, *args, **kwargs: len(tipos_doc))
+def claves_documentos(tipos_doc, folios, ruts=None):
+    """Hash uint64 de (tipo SII, folio, RUT) por documento; 0 si el documento no tiene folio.
+
+    El RUT se compara sin puntos, guion ni espacios y en mayúscula. Cada RUT
+    distinto se normaliza y se hashea una sola vez.
+    """
+    columnas = {'tipo': np.asarray(tipos_doc, dtype=np.int64), 'folio': folios}
+    if ruts is not None:
+        codigos, unicos = pd.factorize(ruts)
+        unicos = pd.Series(unicos, dtype=object).astype(str).str.upper().str.replace(r'[^0-9K]', '', regex=True)
+        # El código -1 (RUT vacío) toma el último elemento: 0
+        hashes_unicos = np.append(pd.util.hash_array(unicos.to_numpy(dtype=object)), np.uint64(0))
+        columnas['rut'] = hashes_unicos[codigos]
+    claves = pd.util.hash_pandas_object(pd.DataFrame(columnas), index=False).to_numpy()
+    return np.where(folios >= 0, claves, np.uint64(0))
 
 def formatear_monto(monto):
     """Formatea monto con separadores de miles."""
@@ -84,3 +283,59 @@ def formatear_monto(monto):
         return f"{signo}${monto_abs:,.0f}"
     else:
         return f"{signo}${monto_abs:,.2f}"
+
+# Textos precalculados para armar montos sin formatear celda por celda
+_GRUPOS = np.array([str(i) for i in range(1000)], dtype=object)
+_GRUPOS_RELLENO = np.array([f'{i:03d}' for i in range(1000)], dtype=object)
+_SIGNOS = np.array(['$', '-$'], dtype=object)
+# Decimales y sufijo por tramo: [0, 100) sin sufijo, [100, 200) ' M', [200, 300) ' MM', 300 tramo de miles
+_TERMINACIONES = np.array(
+    [f'.{i:02d}{sufijo}' for sufijo in ('', ' M', ' MM') for i in range(100)] + [''], dtype=object
+)
+
+def _separar_miles(enteros, separador=','):
+    """Enteros no negativos como texto con separador de miles, grupo de 3 dígitos a la vez."""
+    resto = enteros // 1000
+    texto = np.where(resto > 0, _GRUPOS_RELLENO[enteros % 1000], _GRUPOS[enteros % 1000])
+    # Solo se siguen procesando los que aún tienen grupos pendientes
+    pendientes = np.flatnonzero(resto)
+    while len(pendientes):
+        grupo = resto[pendientes] % 1000
+        restante = resto[pendientes] // 1000
+        resto[pendientes] = restante
+        prefijo = np.where(restante > 0, _GRUPOS_RELLENO[grupo], _GRUPOS[grupo])
+        texto[pendientes] = prefijo + separador + texto[pendientes]
+        pendientes = pendientes[restante > 0]
+    return texto
+
+@instrumentar(filas=largo_primer_argumento)
+def formatear_montos(montos):
+    """Versión vectorizada de formatear_monto: mismos tramos (M / MM) y signo para todo un arreglo.
+
+    Devuelve un arreglo de textos (o una Serie con el mismo índice si recibe una Serie).
+    """
+    valores = np.asarray(montos, dtype=np.float64)
+    absolutos = np.abs(valores)
+    finitos = np.isfinite(valores)
+    
+    es_mm = absolutos >= 1_000_000_000
+    es_m = ~es_mm & (absolutos >= 1_000_000)
+    es_miles = (absolutos >= 1_000) & (absolutos < 1_000_000)
+    escalados = absolutos / np.select([es_mm, es_m], [1_000_000_000, 1_000_000], 1)
+    
+    # Centavos (el tramo de miles va sin decimales, np.rint redondea igual que format)
+    en_centavos = np.where(finitos, escalados * 100, 0)
+    centavos = np.where(es_miles, np.rint(np.where(finitos, absolutos, 0)) * 100, np.rint(en_centavos)).astype(np.int64)
+    
+    terminacion = np.where(es_miles, 300, np.select([es_mm, es_m], [200, 100], 0) + centavos % 100)
+    texto = _SIGNOS[(valores < 0).view(np.int8)] + _separar_miles(centavos // 100) + _TERMINACIONES[terminacion]
+    texto[valores == 0] = '$0'
+    
+    # x * 100 puede quedar del otro lado de un medio centavo: esos pocos (y NaN/inf) se formatean uno a uno
+    dudosos = ~finitos | (~es_miles & (np.abs(en_centavos - np.floor(en_centavos) - 0.5) < 1e-6))
+    for i in np.flatnonzero(dudosos):
+        texto[i] = formatear_monto(valores[i])
+    
+    if isinstance(montos, pd.Series):
+        return pd.Series(texto, index=montos.index, name=montos.name)
+    return texto
@@ -1,27 +1,86 @@
 # core/visualizaciones.py
+import hashlib
 import plotly.graph_objects as go
-import plotly.express as px
-import matplotlib.pyplot as plt
 import pandas as pd
 import numpy as np
+from .cache import CacheLRU
+from .instrumentacion import instrumentar, largo_primer_argumento
 from .utils import formatear_monto
 
+# Series largas (detalle diario / por documento): tope de puntos enviados por traza
+MAX_PUNTOS_GRAFICO = 4000
+# Sobre esta cantidad de puntos se usan trazas WebGL (Scattergl) en vez de SVG
+UMBRAL_WEBGL = 1000
+NS_POR_DIA = 86_400 * 10**9
+
+class DatosGraficos:
+    """Resultados por período preparados una sola vez para todos los gráficos.
+
+    El período se interpreta una vez como año y mes (arreglos enteros de solo
+    lectura) y se arma la vista en orden cronológico. Los gráficos leen de
+    `tabla` / `cronologica` sin modificarlas; el DataFrame original nunca se toca.
+    """
+
+    def __init__(self, df_resultados):
+        columnas = {columna: df_resultados[columna] for columna in df_resultados.columns}
+        if 'Resultado' not in columnas and 'Ventas' in columnas and 'Compras' in columnas:
+            columnas['Resultado'] = df_resultados['Ventas'] - df_resultados['Compras']
+        # copy=False: las columnas se comparten con df_resultados sin copiarlas. Como en pandas < 3 no
+        # hay copy-on-write por defecto, escribir en `tabla` modificaría el original: solo se lee
+        self.tabla = pd.DataFrame(columnas, index=df_resultados.index, copy=False)
+
+        periodos = self.tabla['Período'] if 'Período' in columnas else pd.Series([], dtype=object)
+        self.año, self.mes = DatosGraficos._parsear_periodos(periodos)
+        # Períodos que no son AAAA-MM (ej. "Sin_periodo") quedan al final
+        orden = np.lexsort((np.where(self.mes < 0, 13, self.mes), np.where(self.año < 0, 10_000, self.año)))
+        self.cronologica = self.tabla.iloc[orden]
+
+    @staticmethod
+    def _parsear_periodos(periodos):
+        partes = periodos.astype(str).str.extract(r'^(\d{4})-(\d{1,2})$')
+        año = pd.to_numeric(partes[0]).fillna(-1).to_numpy(dtype=np.int32)
+        mes = pd.to_numeric(partes[1]).fillna(-1).to_numpy(dtype=np.int32)
+        año.flags.writeable = False
+        mes.flags.writeable = False
+        return año, mes
+
+    @staticmethod
+    def desde(datos):
+        """Acepta un DataFrame de resultados o un DatosGraficos ya preparado."""
+        if isinstance(datos, DatosGraficos):
+            return datos
+        return DatosGraficos(datos)
+
+    @property
+    def vacio(self):
+        return self.tabla.empty
+
+    def __len__(self):
+        return len(self.tabla)
+
+    def tiene(self, *columnas):
+        """True si están todas las columnas."""
+        return all(columna in self.tabla.columns for columna in columnas)
+
 class VisualizadorResultados:
     """Clase para crear visualizaciones interactivas de resultados."""
     
     @staticmethod
+    @instrumentar(filas=largo_primer_argumento)
     def crear_grafico_barras_apiladas(df_resultados):
         """Crea gráfico de barras apiladas de ventas vs compras por período."""
-        if df_resultados.empty:
+        datos = DatosGraficos.desde(df_resultados)
+        if datos.vacio:
             return None
+        tabla = datos.tabla
         
         fig = go.Figure()
         
         # Barras de ventas
         fig.add_trace(go.Bar(
             name='Ventas',
-            x=df_resultados['Período'],
-            y=df_resultados['Ventas'],
+            x=tabla['Período'],
+            y=tabla['Ventas'],
             marker_color='#2ecc71',
             hovertemplate='<b>%{x}</b><br>Ventas: %{y:$,.0f}<extra></extra>'
         ))
@@ -29,8 +88,8 @@ class VisualizadorResultados:
         # Barras de compras (negativas para comparación)
         fig.add_trace(go.Bar(
             name='Compras',
-            x=df_resultados['Período'],
-            y=df_resultados['Compras'],
+            x=tabla['Período'],
+            y=tabla['Compras'],
             marker_color='#e74c3c',
             hovertemplate='<b>%{x}</b><br>Compras: %{y:$,.0f}<extra></extra>'
         ))
@@ -48,20 +107,20 @@ class VisualizadorResultados:
         return fig
     
     @staticmethod
+    @instrumentar(filas=largo_primer_argumento)
     def crear_grafico_linea_resultado(df_resultados):
         """Crea gráfico de línea del resultado neto por período."""
-        if df_resultados.empty:
+        # El resultado neto ya viene calculado en DatosGraficos si faltaba
+        datos = DatosGraficos.desde(df_resultados)
+        if datos.vacio:
             return None
-        
-        # Calcular resultado neto si no existe
-        if 'Resultado' not in df_resultados.columns:
-            df_resultados['Resultado'] = df_resultados['Ventas'] - df_resultados['Compras']
+        tabla = datos.tabla
         
         fig = go.Figure()
         
         fig.add_trace(go.Scatter(
-            x=df_resultados['Período'],
-            y=df_resultados['Resultado'],
+            x=tabla['Período'],
+            y=tabla['Resultado'],
             mode='lines+markers',
             name='Resultado Neto',
             line=dict(color='#3498db', width=3),
@@ -88,22 +147,26 @@ class VisualizadorResultados:
         return fig
     
     @staticmethod
+    @instrumentar(filas=largo_primer_argumento)
     def crear_grafico_margen(df_resultados):
         """Crea gráfico de barras del margen porcentual."""
-        if df_resultados.empty or 'Margen %' not in df_resultados.columns:
+        datos = DatosGraficos.desde(df_resultados)
+        if datos.vacio or not datos.tiene('Margen %'):
             return None
+        tabla = datos.tabla
         
         # Calcular colores según margen
-        colores = ['#e74c3c' if x < 0 else '#2ecc71' for x in df_resultados['Margen %']]
+        colores = np.where(tabla['Margen %'] < 0, '#e74c3c', '#2ecc71')
         
         fig = go.Figure()
         
         fig.add_trace(go.Bar(
-            x=df_resultados['Período'],
-            y=df_resultados['Margen %'],
+            x=tabla['Período'],
+            y=tabla['Margen %'],
             marker_color=colores,
             hovertemplate='<b>%{x}</b><br>Margen: %{y:.1f}%<extra></extra>',
-            text=df_resultados['Margen %'].apply(lambda x: f'{x:+.1f}%'),
+            # Plotly formatea el texto en el navegador, sin un string por barra en Python
+            texttemplate='%{y:+.1f}%',
             textposition='auto'
         ))
         
@@ -125,6 +188,7 @@ class VisualizadorResultados:
         return fig
     
     @staticmethod
+    @instrumentar()
     def crear_grafico_torta_totales(totales):
         """Crea gráfico de torta de la distribución total."""
         if not totales or totales['ventas_totales'] == 0:
@@ -156,18 +220,21 @@ class VisualizadorResultados:
         return fig
     
     @staticmethod
+    @instrumentar(filas=largo_primer_argumento)
     def crear_grafico_documentos(df_resultados):
         """Crea gráfico de documentos por período."""
-        if df_resultados.empty or 'Docs V' not in df_resultados.columns:
+        datos = DatosGraficos.desde(df_resultados)
+        if datos.vacio or not datos.tiene('Docs V', 'Docs C'):
             return None
+        tabla = datos.tabla
         
         fig = go.Figure()
         
         # Documentos de ventas
         fig.add_trace(go.Bar(
             name='Docs Ventas',
-            x=df_resultados['Período'],
-            y=df_resultados['Docs V'],
+            x=tabla['Período'],
+            y=tabla['Docs V'],
             marker_color='#2ecc71',
             opacity=0.7,
             hovertemplate='<b>%{x}</b><br>Docs Ventas: %{y}<extra></extra>'
@@ -176,8 +243,8 @@ class VisualizadorResultados:
         # Documentos de compras
         fig.add_trace(go.Bar(
             name='Docs Compras',
-            x=df_resultados['Período'],
-            y=df_resultados['Docs C'],
+            x=tabla['Período'],
+            y=tabla['Docs C'],
             marker_color='#e74c3c',
             opacity=0.7,
             hovertemplate='<b>%{x}</b><br>Docs Compras: %{y}<extra></extra>'
@@ -194,19 +261,21 @@ class VisualizadorResultados:
         return fig
     
     @staticmethod
+    @instrumentar(filas=largo_primer_argumento)
     def crear_heatmap_correlacion(df_resultados):
         """Crea heatmap de correlación entre variables."""
-        if df_resultados.empty or len(df_resultados) < 3:
+        datos = DatosGraficos.desde(df_resultados)
+        if datos.vacio or len(datos) < 3:
             return None
         
-        # Seleccionar columnas numéricas
-        columnas_numericas = df_resultados.select_dtypes(include=[np.number]).columns
+        # Seleccionar columnas numéricas (año y mes no son parte de la tabla)
+        columnas_numericas = datos.tabla.select_dtypes(include=[np.number]).columns
         
         if len(columnas_numericas) < 2:
             return None
         
         # Calcular matriz de correlación
-        correlacion = df_resultados[columnas_numericas].corr()
+        correlacion = datos.tabla[columnas_numericas].corr()
         
         fig = go.Figure(data=go.Heatmap(
             z=correlacion.values,
@@ -230,17 +299,15 @@ class VisualizadorResultados:
         return fig
     
     @staticmethod
+    @instrumentar(filas=largo_primer_argumento)
     def crear_grafico_evolucion_mensual(df_resultados):
         """Crea gráfico de evolución mensual comparativa."""
-        if df_resultados.empty:
+        datos = DatosGraficos.desde(df_resultados)
+        if datos.vacio:
             return None
         
-        # Extraer año y mes del período
-        df_resultados['Año'] = df_resultados['Período'].str.split('-').str[0].astype(int)
-        df_resultados['Mes'] = df_resultados['Período'].str.split('-').str[1].astype(int)
-        
-        # Ordenar por año y mes
-        df_ordenado = df_resultados.sort_values(['Año', 'Mes'])
+        # Vista ya ordenada por año y mes
+        df_ordenado = datos.cronologica
         
         fig = go.Figure()
         
@@ -276,30 +343,234 @@ class VisualizadorResultados:
         return fig
     
     @staticmethod
-    def crear_dashboard_completo(df_resultados, totales, estadisticas):
-        """Crea un dashboard completo con múltiples visualizaciones."""
-        figs = {}
+    def reducir_min_max(valores, max_puntos=MAX_PUNTOS_GRAFICO):
+        """Índices (ordenados) de los puntos a graficar de una serie larga.
+
+        Divide la serie en max_puntos / 2 tramos consecutivos de igual tamaño y
+        conserva el mínimo y el máximo de cada uno (más el primer y último punto),
+        así los picos siguen visibles con un tamaño acotado.
+        """
+        cantidad = len(valores)
+        if cantidad <= max_puntos:
+            return np.arange(cantidad)
+        
+        tramos = max(max_puntos // 2 - 1, 1)
+        tramo = np.arange(cantidad) * tramos // cantidad
+        # Dentro de cada tramo, orden por valor: el primero es el mínimo y el último el máximo
+        orden = np.lexsort((valores, tramo))
+        limites = np.flatnonzero(np.diff(tramo[orden])) + 1
+        minimos = orden[np.concatenate(([0], limites))]
+        maximos = orden[np.concatenate((limites - 1, [cantidad - 1]))]
+        return np.unique(np.concatenate((minimos, maximos, [0, cantidad - 1])))
+    
+    @staticmethod
+    def _traza_serie(x, y, max_puntos, **kwargs):
+        """Traza Scatter reducida; con muchos puntos usa WebGL (Scattergl)."""
+        indices = VisualizadorResultados.reducir_min_max(y, max_puntos)
+        traza = go.Scattergl if len(indices) > UMBRAL_WEBGL else go.Scatter
+        return traza(x=x[indices], y=y[indices], **kwargs), len(indices)
+    
+    @staticmethod
+    def serie_diaria(documentos):
+        """(días datetime64[D], ventas, compras) con los montos sumados por día.
+        
+        `documentos` es una ColeccionDocumentos o una lista de ellas (p. ej.
+        las de un período de VistaDocumentos), que se suman sin concatenarlas.
+        """
+        colecciones = documentos if isinstance(documentos, (list, tuple)) else [documentos]
+        colecciones = [c for c in colecciones if len(c)]
+        if not colecciones:
+            return np.array([], dtype='datetime64[D]'), np.zeros(0), np.zeros(0)
+        
+        primer_dia = min(c.fechas.min() for c in colecciones) // NS_POR_DIA
+        cantidad_dias = int(max(c.fechas.max() for c in colecciones) // NS_POR_DIA - primer_dia) + 1
+        ventas = np.zeros(cantidad_dias)
+        compras = np.zeros(cantidad_dias)
+        conteos = np.zeros(cantidad_dias, dtype=np.int64)
+        for coleccion in colecciones:
+            indice = coleccion.fechas // NS_POR_DIA - primer_dia
+            es_venta = coleccion.mascara_tipo('venta')
+            ventas += np.bincount(indice, weights=np.where(es_venta, coleccion.montos, 0), minlength=cantidad_dias)
+            compras += np.bincount(indice, weights=np.where(es_venta, 0, coleccion.montos), minlength=cantidad_dias)
+            conteos += np.bincount(indice, minlength=cantidad_dias)
+        # Solo los días con documentos
+        activos = np.flatnonzero(conteos)
+        
+        return (primer_dia + activos).astype('datetime64[D]'), ventas[activos], compras[activos]
+    
+    @staticmethod
+    @instrumentar(filas=lambda fig, documentos, *args, **kwargs: (
+        sum(len(c) for c in documentos) if isinstance(documentos, (list, tuple)) else len(documentos)
+    ))
+    def crear_grafico_diario(documentos, max_puntos=MAX_PUNTOS_GRAFICO):
+        """Crea gráfico de ventas, compras y resultado por día (una colección o una lista de ellas)."""
+        dias, ventas, compras = VisualizadorResultados.serie_diaria(documentos)
+        if len(dias) == 0:
+            return None
         
-        # 1. Gráfico principal de barras
-        figs['barras_apiladas'] = VisualizadorResultados.crear_grafico_barras_apiladas(df_resultados)
+        fig = go.Figure()
+        series = [
+            ('Ventas', ventas, '#2ecc71'),
+            ('Compras', compras, '#e74c3c'),
+            ('Resultado', ventas - compras, '#3498db')
+        ]
+        for nombre, valores, color in series:
+            traza, _ = VisualizadorResultados._traza_serie(
+                dias, valores, max_puntos,
+                mode='lines',
+                name=nombre,
+                line=dict(color=color, width=1.5),
+                hovertemplate=f'<b>%{{x|%d/%m/%Y}}</b><br>{nombre}: %{{y:$,.0f}}<extra></extra>'
+            )
+            fig.add_trace(traza)
         
-        # 2. Gráfico de resultado neto
-        figs['linea_resultado'] = VisualizadorResultados.crear_grafico_linea_resultado(df_resultados)
+        fig.update_layout(
+            title=f'📅 Evolución Diaria ({len(dias):,} días)',
+            xaxis_title='Fecha',
+            yaxis_title='Monto ($)',
+            hovermode='x unified',
+            height=400
+        )
         
-        # 3. Gráfico de margen
-        figs['barras_margen'] = VisualizadorResultados.crear_grafico_margen(df_resultados)
+        return fig
+    
+    @staticmethod
+    @instrumentar(filas=largo_primer_argumento)
+    def crear_grafico_detalle_documentos(documentos, max_puntos=MAX_PUNTOS_GRAFICO):
+        """Crea gráfico de dispersión con el monto de cada documento en el tiempo."""
+        if len(documentos) == 0:
+            return None
         
-        # 4. Gráfico de torta
-        figs['torta_totales'] = VisualizadorResultados.crear_grafico_torta_totales(totales)
+        fig = go.Figure()
+        mostrados = 0
+        for tipo, nombre, color in (('venta', 'Ventas', '#2ecc71'), ('compra', 'Compras', '#e74c3c')):
+            mascara = documentos.mascara_tipo(tipo)
+            if not mascara.any():
+                continue
+            
+            orden = np.argsort(documentos.fechas[mascara], kind='stable')
+            traza, puntos = VisualizadorResultados._traza_serie(
+                documentos.fechas_dt[mascara][orden], documentos.montos[mascara][orden], max_puntos,
+                mode='markers',
+                name=nombre,
+                marker=dict(color=color, size=4, opacity=0.6),
+                hovertemplate=f'<b>%{{x|%d/%m/%Y}}</b><br>{nombre}: %{{y:$,.0f}}<extra></extra>'
+            )
+            fig.add_trace(traza)
+            mostrados += puntos
+        
+        titulo = f'🔎 Detalle por Documento ({len(documentos):,} documentos'
+        if mostrados < len(documentos):
+            titulo += f', {mostrados:,} mostrados'
         
-        # 5. Gráfico de documentos
-        figs['barras_documentos'] = VisualizadorResultados.crear_grafico_documentos(df_resultados)
+        fig.update_layout(
+            title=titulo + ')',
+            xaxis_title='Fecha',
+            yaxis_title='Monto ($)',
+            height=400
+        )
         
-        # 6. Evolución mensual
-        figs['evolucion_mensual'] = VisualizadorResultados.crear_grafico_evolucion_mensual(df_resultados)
+        return fig
+    
+    @staticmethod
+    @instrumentar(filas=largo_primer_argumento)
+    def crear_dashboard_completo(df_resultados, totales, estadisticas):
+        """Registra las visualizaciones del dashboard; cada una se construye al pedirla."""
+        # Período, año/mes y orden se preparan una vez para todos los gráficos
+        datos = DatosGraficos(df_resultados)
+        constructores = {
+            # 1. Gráfico principal de barras
+            'barras_apiladas': lambda: VisualizadorResultados.crear_grafico_barras_apiladas(datos),
+            # 2. Gráfico de resultado neto
+            'linea_resultado': lambda: VisualizadorResultados.crear_grafico_linea_resultado(datos),
+            # 3. Gráfico de margen
+            'barras_margen': lambda: VisualizadorResultados.crear_grafico_margen(datos),
+            # 4. Gráfico de torta
+            'torta_totales': lambda: VisualizadorResultados.crear_grafico_torta_totales(totales),
+            # 5. Gráfico de documentos
+            'barras_documentos': lambda: VisualizadorResultados.crear_grafico_documentos(datos),
+            # 6. Evolución mensual
+            'evolucion_mensual': lambda: VisualizadorResultados.crear_grafico_evolucion_mensual(datos)
+        }
         
         # 7. Heatmap de correlación (si hay suficientes datos)
-        if len(df_resultados) >= 3:
-            figs['heatmap_correlacion'] = VisualizadorResultados.crear_heatmap_correlacion(df_resultados)
+        if len(datos) >= 3:
+            constructores['heatmap_correlacion'] = lambda: VisualizadorResultados.crear_heatmap_correlacion(datos)
         
+        return FigurasDashboard(constructores)
+
+class FigurasDashboard:
+    """Registro perezoso de figuras: cada una se construye la primera vez que se pide.
+
+    Se usa como el dict que devolvía crear_dashboard_completo (`figs.get(nombre)`,
+    `figs[nombre]`, `nombre in figs`), pero una figura que la vista no muestra
+    nunca se construye.
+    """
+
+    def __init__(self, constructores):
+        self.constructores = constructores
+        self.figuras = {}
+
+    def __contains__(self, nombre):
+        return nombre in self.constructores
+
+    def __getitem__(self, nombre):
+        if nombre not in self.figuras:
+            self.figuras[nombre] = self.constructores[nombre]()
+        return self.figuras[nombre]
+
+    def get(self, nombre, defecto=None):
+        """Figura `nombre` (construyéndola si hace falta), o `defecto` si no está registrada."""
+        if nombre not in self.constructores:
+            return defecto
+        return self[nombre]
+
+    def keys(self):
+        return self.constructores.keys()
+
+    @property
+    def construidas(self):
+        """Nombres de las figuras ya construidas."""
+        return list(self.figuras)
+
+class CacheFiguras:
+    """Cache de dashboards ya construidos, indexada por huella de los resultados y modo de análisis.
+
+    En cada rerun de Streamlit los resultados agregados suelen ser los mismos;
+    si la huella coincide se devuelven las figuras ya armadas en vez de
+    reconstruirlas. Se guardan a lo más `max_dashboards` (desalojo LRU).
+    """
+
+    def __init__(self, max_dashboards=16):
+        # Sin función de tamaño, CacheLRU cuenta entradas
+        self.cache = CacheLRU(max_dashboards)
+
+    @staticmethod
+    def huella(df_resultados, totales, modo):
+        """Hash estable del DataFrame de resultados, los totales y el modo."""
+        h = hashlib.blake2b(digest_size=16)
+        h.update(repr((list(df_resultados.columns), sorted((totales or {}).items()), modo)).encode('utf-8'))
+        h.update(pd.util.hash_pandas_object(df_resultados, index=False).values.tobytes())
+        return h.hexdigest()
+
+    def dashboard(self, df_resultados, totales, estadisticas, modo=None):
+        """Como VisualizadorResultados.crear_dashboard_completo, sin reconstruir figuras ya vistas."""
+        clave = CacheFiguras.huella(df_resultados, totales, modo)
+        figs = self.cache.obtener(clave)
+        if figs is None:
+            figs = VisualizadorResultados.crear_dashboard_completo(df_resultados, totales, estadisticas)
+            self.cache.guardar(clave, figs)
         return figs
+
+    def limpiar(self):
+        """Vacía la cache de figuras."""
+        self.cache.limpiar()
+
+    def estadisticas(self):
+        """Resumen de uso de la cache y de cuántas de las figuras registradas se llegaron a construir."""
+        dashboards = [figs for figs, _ in self.cache.entradas.values()]
+        return {
+            **self.cache.estadisticas(),
+            'figuras_construidas': sum(len(figs.construidas) for figs in dashboards),
+            'figuras_registradas': sum(len(figs.keys()) for figs in dashboards)
+        }
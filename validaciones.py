@@ -1,5 +1,5 @@
 # validaciones.py (mantener el actual)
-import pandas as pd
+from core.utils import normalizar_montos
 
 def validar_ventas_sii(df, tolerancia=1):
     """Valida documentos de ventas."""
@@ -10,14 +10,7 @@ def validar_ventas_sii(df, tolerancia=1):
         return df
     
     # Convertir a numérico si es necesario
-    if df['monto_total'].dtype == 'object':
-        df['monto_total'] = (
-            df['monto_total']
-            .astype(str)
-            .str.replace('.', '', regex=False)
-            .str.replace(',', '.', regex=False)
-        )
-        df['monto_total'] = pd.to_numeric(df['monto_total'], errors='coerce').fillna(0)
+    df['monto_total'], _ = normalizar_montos(df['monto_total'])
     
     # Marcar todos como válidos para simplificar
     df['valido'] = True